@@ -4,33 +4,51 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 from datetime import datetime
+from analysis_utils import DataAnalyzer
+from date_utils import parse_roc_dates
 
 class AdvancedVisualizer:
     def __init__(self, data):
-        self.data = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+        # 傳入 DataAnalyzer 時沿用其作物索引，避免每次繪圖都掃描整個資料表
+        if isinstance(data, DataAnalyzer):
+            self.analyzer = data
+            self.data = data.data
+        else:
+            self.analyzer = None
+            self.data = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+
+    def get_crop_data(self, crop_name):
+        """取得特定作物的資料"""
+        if self.analyzer is not None:
+            return self.analyzer.get_crop_data(crop_name)
+        return self.data[self.data['作物名稱'] == crop_name]
 
     def create_interactive_price_trend(self, crop_name):
         """創建互動式價格趨勢圖"""
         try:
-            # 篩選特定作物的資料
-            df = self.data[self.data['作物名稱'] == crop_name].copy()
-            
-            # 轉換日期格式
-            def convert_tw_date(date_str):
-                try:
-                    year, month, day = map(int, date_str.split('.'))
-                    year += 1911  # 民國年轉西元年
-                    return f"{year}/{month:02d}/{day:02d}"
-                except:
-                    return date_str
-
-            df['交易日期'] = df['交易日期'].apply(convert_tw_date)
-            df['交易日期'] = pd.to_datetime(df['交易日期'])
-            df = df.sort_values('交易日期')
-            
-            # 計算移動平均
-            df['7日均價'] = df['平均價'].rolling(window=7).mean()
-            df['30日均價'] = df['平均價'].rolling(window=30).mean()
+            if self.analyzer is not None:
+                # 由分析器的滾動統計取得每日均價與移動平均，不需每次重新計算
+                stats = self.analyzer.get_rolling_stats().get_frame(crop_name)
+                df = pd.DataFrame({
+                    '交易日期': stats['日期'],
+                    '平均價': stats['平均價'],
+                    '7日均價': stats['MA7'],
+                    '30日均價': stats['MA30'],
+                })
+            else:
+                # 篩選特定作物的資料
+                df = self.get_crop_data(crop_name).copy()
+                
+                # 轉換日期格式（已由分析器轉換時直接沿用）
+                if '日期' in df.columns:
+                    df['交易日期'] = df['日期']
+                else:
+                    df['交易日期'] = parse_roc_dates(df['交易日期'])
+                df = df.sort_values('交易日期')
+                
+                # 計算移動平均
+                df['7日均價'] = df['平均價'].rolling(window=7).mean()
+                df['30日均價'] = df['平均價'].rolling(window=30).mean()
             
             # 創建圖表
             fig = go.Figure()
@@ -87,10 +105,10 @@ class AdvancedVisualizer:
 
     def create_market_distribution(self, crop_name):
         """建立市場分布圖"""
-        df = self.data[self.data['作物名稱'] == crop_name].copy()
+        df = self.get_crop_data(crop_name).copy()
         
         # 計算每個市場的總交易量
-        market_volume = df.groupby('市場名稱')['交易量'].sum().sort_values(ascending=True)
+        market_volume = df.groupby('市場名稱', observed=True)['交易量'].sum().sort_values(ascending=True)
 
         # 建立圖表
         fig = go.Figure()
@@ -118,7 +136,7 @@ class AdvancedVisualizer:
 
     def create_price_distribution(self, crop_name):
         """建立價格分布圖"""
-        df = self.data[self.data['作物名稱'] == crop_name].copy()
+        df = self.get_crop_data(crop_name).copy()
 
         fig = go.Figure()
 
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+
+def rollup(cells, by=None):
+    """將彙總格再依 by 合併並計算統計值
+
+    by 可為欄位名稱、欄位名稱串列或與 cells 等長的陣列；未指定時合併為單一列。
+    回傳欄位：筆數、平均價、最低價、最高價、價格標準差、交易量、平均交易量、
+    最大交易量、加權平均價。
+    """
+    additive = ['筆數', '價格總和', '價格平方和', '交易量', '價量總和']
+    if by is None:
+        totals = cells[additive].sum().to_frame().T
+        totals['最低價'] = cells['最低價'].min()
+        totals['最高價'] = cells['最高價'].max()
+        totals['最大交易量'] = cells['最大交易量'].max()
+    else:
+        grouped = cells.groupby(by, observed=True)
+        totals = grouped[additive].sum()
+        totals['最低價'] = grouped['最低價'].min()
+        totals['最高價'] = grouped['最高價'].max()
+        totals['最大交易量'] = grouped['最大交易量'].max()
+
+    count = totals['筆數']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (totals['價格平方和'] - totals['價格總和'] ** 2 / count) / (count - 1)
+        stats = pd.DataFrame({
+            '筆數': count.astype('int64'),
+            '平均價': totals['價格總和'] / count,
+            '最低價': totals['最低價'],
+            '最高價': totals['最高價'],
+            '價格標準差': np.sqrt(variance.clip(lower=0)).where(count > 1),
+            '交易量': totals['交易量'],
+            '平均交易量': totals['交易量'] / count,
+            '最大交易量': totals['最大交易量'],
+            '加權平均價': (totals['價量總和'] / totals['交易量']).where(totals['交易量'] > 0),
+        }, index=totals.index)
+    return stats
+
+
+def to_agg_frame(stats, price_stats, volume_stats):
+    """將 rollup 結果轉為與 groupby().agg({'平均價': [...], '交易量': [...]}) 相同的欄位格式"""
+    price_columns = {'mean': '平均價', 'min': '最低價', 'max': '最高價', 'std': '價格標準差'}
+    volume_columns = {'sum': '交易量', 'mean': '平均交易量', 'max': '最大交易量'}
+    columns = {('平均價', name): stats[price_columns[name]] for name in price_stats}
+    columns.update({('交易量', name): stats[volume_columns[name]] for name in volume_stats})
+    return pd.DataFrame(columns, index=stats.index)
+
+
+class AggregateCube:
+    """作物 × 市場 × 日期的預先彙總表
+
+    每個資料格保存筆數、價格總和、價格平方和、最低/最高價、交易量、最大交易量
+    與價量總和（平均價 × 交易量），各種統計都能由資料格合併求得，不需再掃描原始資料。
+    資料格依作物、日期排序並建立作物索引，日期範圍以二分搜尋篩選。
+    """
+
+    def __init__(self, data):
+        prices = data['平均價'].astype('float64')
+        volumes = data['交易量'].astype('float64')
+        frame = pd.DataFrame({
+            '作物名稱': data['作物名稱'],
+            '市場名稱': data['市場名稱'],
+            '日期': data['日期'],
+            '平均價': prices,
+            '價格平方': prices * prices,
+            '交易量': volumes,
+            '價量': prices * volumes,
+        })
+        grouped = frame.groupby(['作物名稱', '日期', '市場名稱'], observed=True, sort=True)
+        cells = grouped.agg(
+            筆數=('平均價', 'size'),
+            價格總和=('平均價', 'sum'),
+            價格平方和=('價格平方', 'sum'),
+            最低價=('平均價', 'min'),
+            最高價=('平均價', 'max'),
+            交易量=('交易量', 'sum'),
+            最大交易量=('交易量', 'max'),
+            價量總和=('價量', 'sum'),
+        ).reset_index()
+        cells['月份'] = cells['日期'].dt.month.astype('int8')
+        self.cells = cells
+        self.dates = cells['日期'].to_numpy(dtype='datetime64[ns]')
+        self.crop_index = self.build_crop_index()
+        # 全域的日期排序，跨作物的日期範圍以二分搜尋取得
+        self.date_order = np.argsort(self.dates, kind='stable')
+        self.sorted_dates = self.dates[self.date_order]
+
+    def build_crop_index(self):
+        """建立作物名稱對應資料格範圍的索引"""
+        crops = self.cells['作物名稱'].to_numpy()
+        if len(crops) == 0:
+            return {}
+        starts = np.concatenate(([0], np.flatnonzero(crops[1:] != crops[:-1]) + 1))
+        stops = np.append(starts[1:], len(crops))
+        return {crops[start]: (int(start), int(stop)) for start, stop in zip(starts, stops)}
+
+    def get_cells(self, crop_name, start_date=None, end_date=None):
+        """取得特定作物（可限定日期範圍，含頭尾）的資料格"""
+        start, stop = self.crop_index.get(crop_name, (0, 0))
+        dates = self.dates[start:stop]
+        if start_date is not None:
+            start += int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start_date), 'ns'), side='left'))
+        if end_date is not None:
+            stop -= len(dates) - int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end_date), 'ns'), side='right'))
+        return self.cells.iloc[start:max(start, stop)]
+
+    def get_range_cells(self, start_date=None, end_date=None):
+        """取得所有作物在日期範圍內（含頭尾）的資料格，維持依作物排序
+
+        以全域日期排序二分搜尋範圍，只排序範圍內的位置，不掃描整個彙總表。
+        """
+        if start_date is None and end_date is None:
+            return self.cells
+        low = 0 if start_date is None else int(np.searchsorted(
+            self.sorted_dates, np.datetime64(pd.Timestamp(start_date), 'ns'), side='left'))
+        high = len(self.sorted_dates) if end_date is None else int(np.searchsorted(
+            self.sorted_dates, np.datetime64(pd.Timestamp(end_date), 'ns'), side='right'))
+        return self.cells.iloc[np.sort(self.date_order[low:max(low, high)])]
+
+    def rollup(self, crop_name, by=None, start_date=None, end_date=None):
+        """特定作物依 by（例如 '日期'、'月份'、'市場名稱'）合併的統計值"""
+        return rollup(self.get_cells(crop_name, start_date, end_date), by)
@@ -1,18 +1,47 @@
 import pandas as pd
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import StandardScaler
-import matplotlib.pyplot as plt
-import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import os
+import copy
+import hashlib
+from aggregate_cube import AggregateCube, rollup, to_agg_frame
+from anomaly_detection import AnomalyDetector
+from crop_similarity import CORRELATION_CACHE_FILE, CropSimilarityEngine
+from date_utils import parse_roc_dates, to_roc_dates
+from forecasting import (ANNUAL_PERIOD, FORECAST_MODELS, SEASONAL_HISTORY_DAYS, ExponentialSmoothingForecaster,
+                         build_daily_price_matrix, fit_trend_month_models, forecast_trend_month)
+from lag_similarity import LaggedSimilarityIndex
+from market_dimension import MarketDimension
+from rolling_stats import RollingStatsEngine
+
+# 星期欄位的類別順序
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
 class DataAnalyzer:
-    def __init__(self, data):
+    def __init__(self, data, compact=False, market_dimension=None):
         self.data = pd.DataFrame(data)
+        self.compact = compact
+        self.market_dimension = market_dimension or MarketDimension.from_config()
+        self.memory_report = None
+        self.crop_index = {}
+        self.similarity_engine = None
+        self.lag_indexes = {}
+        self.forecast_models = {}
+        self.forecast_cache = {}
+        self.rolling_stats = None
+        self.anomaly_detector = None
+        self._dataset_version = None
         self.prepare_data()
+        if self.compact:
+            self.compact_data()
+        self.aggregate_cube = AggregateCube(self.data)
+    
+    @classmethod
+    def from_history(cls, store, start_date=None, end_date=None, crops=None, compact=False,
+                     market_dimension=None):
+        """從本地歷史資料庫依日期範圍載入資料"""
+        return cls(store.load(start_date=start_date, end_date=end_date, crops=crops),
+                   compact=compact, market_dimension=market_dimension)
     
     def prepare_data(self):
         """準備和清理資料"""
@@ -25,18 +54,7 @@ class DataAnalyzer:
         self.data = self.data.dropna(subset=required_columns)
         
         # 轉換民國年日期為西元年日期
-        def convert_tw_date(date_str):
-            try:
-                if not isinstance(date_str, str):
-                    return pd.NaT
-                year, month, day = map(int, date_str.split('.'))
-                year += 1911  # 民國年轉西元年
-                return pd.to_datetime(f'{year}-{month:02d}-{day:02d}')
-            except:
-                return pd.NaT
-        
-        # 轉換日期
-        self.data['日期'] = self.data['交易日期'].apply(convert_tw_date)
+        self.data['日期'] = parse_roc_dates(self.data['交易日期'])
         
         # 移除無效日期的資料
         self.data = self.data.dropna(subset=['日期'])
@@ -54,85 +72,303 @@ class DataAnalyzer:
         self.data['市場名稱'] = self.data['市場名稱'].astype(str)
         
         # 添加星期幾
-        self.data['星期'] = self.data['日期'].dt.day_name()
+        if self.compact:
+            self.data['星期'] = pd.Categorical.from_codes(
+                self.data['日期'].dt.dayofweek.to_numpy(), categories=WEEKDAY_NAMES)
+        else:
+            self.data['星期'] = self.data['日期'].dt.day_name()
         
         # 添加月份
         self.data['月份'] = self.data['日期'].dt.month
+        
+        # 依作物與日期排序並建立作物索引
+        self.data = self.data.sort_values(['作物名稱', '日期'], kind='mergesort', ignore_index=True)
+        self.build_crop_index()
+        self.build_date_index()
+    
+    def build_crop_index(self):
+        """建立作物名稱對應資料列範圍的索引（資料需已依作物排序）"""
+        crops = self.data['作物名稱'].to_numpy()
+        if len(crops) == 0:
+            self.crop_index = {}
+            return self.crop_index
+        
+        starts = np.concatenate(([0], np.flatnonzero(crops[1:] != crops[:-1]) + 1))
+        stops = np.append(starts[1:], len(crops))
+        self.crop_index = {
+            crops[start]: (int(start), int(stop))
+            for start, stop in zip(starts, stops)
+        }
+        return self.crop_index
+    
+    def build_date_index(self):
+        """建立交易日期索引：各作物範圍內日期已排序，可以二分搜尋
+        
+        跨作物的日期範圍由彙總表的全域日期排序提供（AggregateCube.get_range_cells）。
+        """
+        self.dates = self.data['日期'].to_numpy(dtype='datetime64[ns]')
+    
+    @property
+    def dataset_version(self):
+        """資料內容的指紋，資料相同時版本相同，可作為快取的鍵值"""
+        if self._dataset_version is None:
+            columns = ['作物名稱', '市場名稱', '日期', '平均價', '交易量']
+            hashes = pd.util.hash_pandas_object(self.data[columns], index=False).to_numpy()
+            self._dataset_version = hashlib.sha1(hashes.tobytes()).hexdigest()
+        return self._dataset_version
+    
+    def get_crop_names(self):
+        """取得所有作物名稱"""
+        return list(self.crop_index)
+    
+    def get_crop_data(self, crop_name, start_date=None, end_date=None):
+        """依索引取得特定作物的資料（依日期排序，可限定日期範圍），不掃描整個資料表"""
+        start, stop = self.crop_index.get(crop_name, (0, 0))
+        if start_date is not None or end_date is not None:
+            start, stop = self.find_date_range(self.dates[start:stop], start_date, end_date, offset=start)
+        return self.data.iloc[start:stop]
+    
+    def find_date_range(self, sorted_dates, start_date=None, end_date=None, offset=0):
+        """以二分搜尋找出已排序日期中落在範圍內（含頭尾）的位置"""
+        low = 0 if start_date is None else np.searchsorted(
+            sorted_dates, np.datetime64(pd.Timestamp(start_date), 'ns'), side='left')
+        high = len(sorted_dates) if end_date is None else np.searchsorted(
+            sorted_dates, np.datetime64(pd.Timestamp(end_date), 'ns'), side='right')
+        return offset + int(low), offset + max(int(low), int(high))
+    
+    def get_trade_dates(self, crop_name=None):
+        """取得有交易的日期（可指定作物），依日期排序"""
+        if crop_name is None:
+            dates = self.aggregate_cube.sorted_dates
+        else:
+            start, stop = self.crop_index.get(crop_name, (0, 0))
+            dates = self.dates[start:stop]
+        return pd.DatetimeIndex(np.unique(dates))
+    
+    def compact_data(self):
+        """精簡資料：名稱欄位改為類別型態、數值欄位降低精度，並移除已轉換的原始日期字串"""
+        before = int(self.data.memory_usage(deep=True).sum())
+        
+        data = self.data.drop(columns=['交易日期'])
+        for col in data.columns:
+            series = data[col]
+            if isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_datetime64_any_dtype(series):
+                continue
+            if pd.api.types.is_float_dtype(series):
+                data[col] = pd.to_numeric(series, downcast='float')
+            elif pd.api.types.is_integer_dtype(series):
+                data[col] = pd.to_numeric(series, downcast='integer')
+            elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+                data[col] = series.astype('category')
+        self.data = data
+        
+        after = int(self.data.memory_usage(deep=True).sum())
+        self.memory_report = {
+            'before': before,
+            'after': after,
+            'ratio': before / after if after else 0.0,
+        }
+        return self.memory_report
+    
+    def format_memory_report(self):
+        """以文字描述精簡前後的記憶體用量"""
+        if not self.memory_report:
+            return ""
+        report = self.memory_report
+        return (f"記憶體用量 {report['before'] / 1024 / 1024:.1f} MB → "
+                f"{report['after'] / 1024 / 1024:.1f} MB（縮小 {report['ratio']:.1f} 倍）")
     
     def get_price_trend(self, crop_name):
         """獲取價格趨勢資料"""
-        crop_data = self.data[self.data['作物名稱'] == crop_name]
+        crop_data = self.get_crop_data(crop_name)
         daily_price = crop_data.groupby('日期')['平均價'].mean().reset_index()
         return daily_price
     
     def get_volume_by_market(self, crop_name):
         """獲取各市場交易量資料"""
-        crop_data = self.data[self.data['作物名稱'] == crop_name]
-        market_volume = crop_data.groupby('市場名稱')['交易量'].sum().reset_index()
+        market_volume = self.aggregate_cube.rollup(crop_name, by='市場名稱')['交易量'].reset_index()
         return market_volume
-    
+
+    def get_market_table(self):
+        """取得資料中所有市場的維度表（區域、縣市、座標）"""
+        return self.market_dimension.build_table(self.data['市場名稱'])
+
+    def get_region_stats(self, crop_name, start_date=None, end_date=None):
+        """依區域合併特定作物（可限定日期範圍）的統計值"""
+        cells = self.aggregate_cube.get_cells(crop_name, start_date, end_date)
+        # 市場名稱以類別代碼對應到區域，再一次合併
+        return rollup(cells, self.market_dimension.region_labels(cells['市場名稱']))
+
     def get_price_distribution(self, crop_name):
         """獲取價格分布資料"""
-        crop_data = self.data[self.data['作物名稱'] == crop_name]
+        crop_data = self.get_crop_data(crop_name)
         return crop_data['平均價']
     
-    def predict_price(self, crop_name, days=7):
-        """預測未來價格"""
-        crop_data = self.data[self.data['作物名稱'] == crop_name].copy()
-        
-        # 準備特徵
-        crop_data['日期序號'] = (crop_data['日期'] - crop_data['日期'].min()).dt.days
-        X = crop_data[['日期序號', '月份']]
-        y = crop_data['平均價']
-        
-        # 訓練模型
-        model = LinearRegression()
-        model.fit(X, y)
+    def get_forecaster(self, model='linear'):
+        """取得擬合好的預測模型，第一次使用時才擬合"""
+        if model not in FORECAST_MODELS:
+            raise ValueError(f"不支援的預測模型：{model}")
+        if model not in self.forecast_models:
+            if model == 'linear':
+                self.forecast_models[model] = fit_trend_month_models(self.data)
+            else:
+                seasonal = model == 'holt_winters'
+                self.forecast_models[model] = ExponentialSmoothingForecaster(
+                    trend=seasonal, seasonal=seasonal).fit(self.data)
+        return self.forecast_models[model]
+    
+    def inherit_forecasters(self, previous):
+        """沿用前一個分析器已擬合的指數平滑模型，只以新增的交易日線上更新
         
-        # 準備預測資料
-        last_date = crop_data['日期'].max()
-        future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=days)
-        future_X = pd.DataFrame({
-            '日期序號': [(date - crop_data['日期'].min()).days for date in future_dates],
-            '月份': [date.month for date in future_dates]
-        })
+        作物集合不同（例如前一個分析器只載入單一作物，或出現新作物）、新資料的起始日
+        早於模型擬合的起始日，或新資料已足以啟用年季節時不沿用，之後使用時再重新擬合。
+        """
+        if previous is None:
+            return
+        crops = set(self.crop_index)
+        matrix = None
+        for model, forecaster in previous.forecast_models.items():
+            if model in self.forecast_models or not isinstance(forecaster, ExponentialSmoothingForecaster):
+                continue
+            if set(forecaster.crops) != crops:
+                continue
+            if matrix is None:
+                matrix = build_daily_price_matrix(self.data)
+            if forecaster.last_date is None or forecaster.last_date not in matrix.index:
+                continue
+            if forecaster.first_date is None or matrix.index[0] < forecaster.first_date:
+                continue
+            if (forecaster.seasonal and ANNUAL_PERIOD not in forecaster.periods
+                    and len(matrix) >= SEASONAL_HISTORY_DAYS):
+                continue
+            self.forecast_models[model] = copy.deepcopy(forecaster).update(matrix)
+    
+    def get_rolling_stats(self):
+        """取得各作物（及作物×市場）每日平均價的滾動統計引擎"""
+        if self.rolling_stats is None:
+            self.rolling_stats = RollingStatsEngine(self)
+        return self.rolling_stats
+    
+    def inherit_rolling_stats(self, previous):
+        """沿用前一個分析器已計算的滾動統計，只加入新的交易日"""
+        if previous is None or previous.rolling_stats is None or self.rolling_stats is not None:
+            return
+        self.rolling_stats = RollingStatsEngine(self)
+        self.rolling_stats.adopt(previous.rolling_stats, self.data)
+    
+    def get_anomaly_detector(self):
+        """取得各作物×市場價格與交易量的異常偵測結果，第一次使用時批次計算"""
+        if self.anomaly_detector is None:
+            self.anomaly_detector = AnomalyDetector().fit(self)
+        return self.anomaly_detector
+    
+    def inherit_anomaly_detector(self, previous):
+        """沿用前一個分析器已計算的異常分數，只計算新的交易日
         
-        # 預測
-        predictions = model.predict(future_X)
-        return pd.DataFrame({
-            '日期': future_dates,
-            '預測價格': predictions
-        })
+        前一個偵測器未涵蓋所有作物×市場序列（例如只載入單一作物）時不沿用，
+        之後使用時再完整計算。
+        """
+        if previous is None or previous.anomaly_detector is None or self.anomaly_detector is not None:
+            return
+        if not previous.anomaly_detector.covers(self):
+            return
+        self.anomaly_detector = AnomalyDetector(previous.anomaly_detector.window,
+                                                previous.anomaly_detector.min_periods,
+                                                previous.anomaly_detector.threshold)
+        self.anomaly_detector.adopt(previous.anomaly_detector, self)
+    
+    def predict_all_prices(self, days=7, model='linear'):
+        """一次預測所有作物未來 days 天的價格，結果依資料版本快取"""
+        key = (self.dataset_version, model, days)
+        if key not in self.forecast_cache:
+            forecaster = self.get_forecaster(model)
+            if model == 'linear':
+                self.forecast_cache[key] = forecast_trend_month(forecaster, days)
+            else:
+                self.forecast_cache[key] = forecaster.forecast(days)
+        return self.forecast_cache[key]
+    
+    def predict_price(self, crop_name, days=7, model='linear'):
+        """預測未來價格"""
+        forecast = self.predict_all_prices(days, model)
+        predictions = forecast[forecast['作物名稱'] == crop_name]
+        return predictions[['日期', '預測價格']].reset_index(drop=True)
     
     def get_seasonal_analysis(self, crop_name):
         """獲取季節性分析資料"""
-        crop_data = self.data[self.data['作物名稱'] == crop_name]
-        monthly_stats = crop_data.groupby('月份').agg({
-            '平均價': ['mean', 'std'],
-            '交易量': ['sum', 'mean']
-        }).round(2)
+        monthly = self.aggregate_cube.rollup(crop_name, by='月份')
+        monthly_stats = to_agg_frame(monthly, ['mean', 'std'], ['sum', 'mean']).round(2)
         return monthly_stats
     
+    def get_latest_prices(self):
+        """取得各作物最新交易日的平均價"""
+        latest_date = self.data.groupby('作物名稱', observed=True)['日期'].transform('max')
+        latest = self.data[self.data['日期'] == latest_date]
+        return latest.groupby('作物名稱', observed=True)['平均價'].mean().to_dict()
+    
+    def get_market_summary(self, start_date=None, end_date=None, by_region=False):
+        """一次計算所有作物（可再依區域細分）在日期範圍內的價格與交易量統計
+
+        由作物 × 市場 × 日期彙總表合併，不需逐一處理各作物。
+        """
+        cells = self.aggregate_cube.get_range_cells(start_date, end_date)
+        keys = ['作物名稱']
+        if by_region:
+            cells = cells.assign(區域=self.market_dimension.region_labels(cells['市場名稱']))
+            keys.append('區域')
+        stats = rollup(cells, keys)
+        summary = pd.DataFrame({
+            '資料筆數': stats['筆數'],
+            '加權平均價': stats['加權平均價'],
+            '平均價': stats['平均價'],
+            '最低價': stats['最低價'],
+            '最高價': stats['最高價'],
+            '標準差': stats['價格標準差'],
+            '總交易量': stats['交易量'],
+            '最新日期': cells.groupby(keys, observed=True)['日期'].max(),
+        }).reset_index()
+        summary['作物名稱'] = summary['作物名稱'].astype(object)
+        numeric_columns = summary.select_dtypes('number').columns
+        summary[numeric_columns] = summary[numeric_columns].round(2)
+        return summary.sort_values('總交易量', ascending=False, ignore_index=True)
+    
+    def export_market_summary(self, summary, filename):
+        """匯出市場總覽（副檔名為 .xlsx 時輸出 Excel，否則輸出 CSV）"""
+        if filename.lower().endswith('.xlsx'):
+            summary.to_excel(filename, sheet_name='市場總覽', index=False)
+        else:
+            summary.to_csv(filename, index=False, encoding='utf-8-sig')
+    
     def get_similar_crops(self, crop_name, n=5):
         """找出價格變動模式相似的作物"""
-        target_crop = self.data[self.data['作物名稱'] == crop_name]
-        target_prices = target_crop.groupby('日期')['平均價'].mean()
-        
-        similarities = {}
-        for crop in self.data['作物名稱'].unique():
-            if crop == crop_name:
-                continue
-            
-            crop_prices = self.data[self.data['作物名稱'] == crop].groupby('日期')['平均價'].mean()
-            # 計算相關係數
-            correlation = target_prices.corr(crop_prices)
-            if not np.isnan(correlation):
-                similarities[crop] = correlation
-        
         # 返回最相似的n個作物
-        return sorted(similarities.items(), key=lambda x: abs(x[1]), reverse=True)[:n]
+        return self.get_similarity_engine().top_k(crop_name, n)
     
-    def create_price_trend_plot(self, crop_name):
+    def get_similarity_engine(self):
+        """取得所有作物的相關係數矩陣，第一次使用時才計算"""
+        if self.similarity_engine is None:
+            self.similarity_engine = CropSimilarityEngine(
+                self.data, cache_path=CORRELATION_CACHE_FILE, version=self.dataset_version)
+        return self.similarity_engine
+    
+    def get_lag_index(self, by_market=False):
+        """取得領先/落後相似度索引（作物或作物×市場序列），第一次使用時才建立"""
+        if by_market not in self.lag_indexes:
+            self.lag_indexes[by_market] = LaggedSimilarityIndex().fit(self.data, by_market=by_market)
+        return self.lag_indexes[by_market]
+    
+    def get_lagged_similar_crops(self, crop_name, n=5):
+        """找出與指定作物在領先/落後數天後價格走勢最相似的作物
+
+        回傳 [(作物, 落後天數, 相關係數)]，落後天數為正代表指定作物領先。
+        """
+        return self.get_lag_index().query(crop_name, n)
+    
+    def get_lagged_similar_markets(self, crop_name, market_name, n=5):
+        """找出與指定作物在指定市場的價格走勢最相似的（作物, 市場）序列"""
+        return self.get_lag_index(by_market=True).query((crop_name, market_name), n)
+    
+    def create_price_trend_plot(self, crop_name, model='linear'):
         """創建價格趨勢圖"""
         daily_price = self.get_price_trend(crop_name)
         
@@ -145,12 +381,12 @@ class DataAnalyzer:
         ))
         
         # 添加預測價格
-        predictions = self.predict_price(crop_name)
+        predictions = self.predict_price(crop_name, model=model)
         fig.add_trace(go.Scatter(
             x=predictions['日期'],
             y=predictions['預測價格'],
             mode='lines+markers',
-            name='預測價格',
+            name=f'預測價格（{FORECAST_MODELS[model]}）',
             line=dict(dash='dash')
         ))
         
@@ -228,39 +464,40 @@ class DataAnalyzer:
         )
         return fig
     
+    def get_export_data(self, crop_name):
+        """取得匯出用的作物資料，還原精簡模式的轉換
+        
+        交易日期欄位由日期重建；float32 欄位依最短十進位表示轉回 float64，
+        避免 56.2 匯出成 56.20000076293945。
+        """
+        crop_data = self.get_crop_data(crop_name).copy()
+        if '交易日期' not in crop_data.columns:
+            crop_data.insert(0, '交易日期', to_roc_dates(crop_data['日期']))
+        for col in crop_data.select_dtypes('float32').columns:
+            # 只轉換不重複的數值，再依代碼對應回每一列
+            codes, uniques = pd.factorize(crop_data[col])
+            restored = np.append(uniques.to_numpy().astype(str).astype('float64'), np.nan)
+            crop_data[col] = restored[codes]
+        return crop_data
+    
     def export_to_excel(self, crop_name, filename):
         """匯出資料到Excel"""
-        crop_data = self.data[self.data['作物名稱'] == crop_name].copy()
+        crop_data = self.get_export_data(crop_name)
         
         # 創建Excel寫入器
         with pd.ExcelWriter(filename, engine='openpyxl') as writer:
             # 匯出原始資料
             crop_data.to_excel(writer, sheet_name='原始資料', index=False)
             
-            # 匯出每日統計
-            daily_stats = crop_data.groupby('日期').agg({
-                '平均價': ['mean', 'min', 'max', 'std'],
-                '交易量': ['sum', 'mean']
-            }).round(2)
-            daily_stats.to_excel(writer, sheet_name='每日統計')
-            
-            # 匯出月度統計
-            monthly_stats = crop_data.groupby('月份').agg({
-                '平均價': ['mean', 'min', 'max', 'std'],
-                '交易量': ['sum', 'mean']
-            }).round(2)
-            monthly_stats.to_excel(writer, sheet_name='月度統計')
-            
-            # 匯出市場統計
-            market_stats = crop_data.groupby('市場名稱').agg({
-                '平均價': ['mean', 'min', 'max', 'std'],
-                '交易量': ['sum', 'mean']
-            }).round(2)
-            market_stats.to_excel(writer, sheet_name='市場統計')
+            # 匯出每日、月度與市場統計（由彙總表合併）
+            for by, sheet_name in [('日期', '每日統計'), ('月份', '月度統計'), ('市場名稱', '市場統計')]:
+                stats = self.aggregate_cube.rollup(crop_name, by=by)
+                stats = to_agg_frame(stats, ['mean', 'min', 'max', 'std'], ['sum', 'mean']).round(2)
+                stats.to_excel(writer, sheet_name=sheet_name)
     
     def export_to_csv(self, crop_name, filename):
         """匯出資料到CSV"""
-        crop_data = self.data[self.data['作物名稱'] == crop_name]
+        crop_data = self.get_export_data(crop_name)
         crop_data.to_csv(filename, index=False, encoding='utf-8-sig')
     
     def save_plot_as_image(self, fig, filename):
@@ -0,0 +1,182 @@
+import warnings
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 滾動視窗（同一作物×市場之前的交易日數）與計算所需的最少歷史筆數
+DEFAULT_WINDOW = 30
+MIN_PERIODS = 10
+
+# 穩健 z 分數的異常門檻
+Z_THRESHOLD = 3.5
+
+# MAD 換算為常態分布標準差的係數
+MAD_SCALE = 1.4826
+
+# 價格長期不變時 MAD 為 0，以中位數的 1% 作為下限，避免微小波動被放大
+MIN_MAD_RATIO = 0.01
+
+# 每次批次計算的列數，控制（列數 × 視窗）暫存陣列的大小
+ROWS_PER_CHUNK = 200_000
+
+# 觀測值欄位
+OBSERVATION_COLUMNS = ['作物名稱', '市場名稱', '日期', '平均價', '交易量']
+
+
+def build_observations(cells):
+    """將彙總表的資料格轉為作物×市場×日期的觀測值（當日平均價與總交易量）"""
+    return pd.DataFrame({
+        '作物名稱': cells['作物名稱'].astype(object).to_numpy(),
+        '市場名稱': cells['市場名稱'].astype(object).to_numpy(),
+        '日期': cells['日期'].to_numpy(),
+        '平均價': (cells['價格總和'] / cells['筆數']).to_numpy(dtype='float64'),
+        '交易量': cells['交易量'].to_numpy(dtype='float64'),
+    })
+
+
+def rolling_median_mad(values, series_ids, window=DEFAULT_WINDOW, min_periods=MIN_PERIODS,
+                       rows_per_chunk=ROWS_PER_CHUNK):
+    """計算每筆觀測值之前 window 筆（同一序列內）的中位數與 MAD
+
+    values 與 series_ids 需依序列、日期排序。以滑動視窗檢視組成（列數 × 視窗）陣列，
+    跨序列的位置遮罩為 NaN，再分批以 nanmedian 一次計算。
+    """
+    n = len(values)
+    medians = np.full(n, np.nan)
+    mads = np.full(n, np.nan)
+    padded = np.concatenate([np.full(window, np.nan), values])
+    padded_ids = np.concatenate([np.full(window, -1), series_ids])
+    with warnings.catch_warnings():
+        # 歷史不足的列整列為 NaN，nanmedian 會發出警告
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for start in range(0, n, rows_per_chunk):
+            stop = min(n, start + rows_per_chunk)
+            windows = sliding_window_view(padded[start:stop + window - 1], window)
+            ids = sliding_window_view(padded_ids[start:stop + window - 1], window)
+            windows = np.where(ids == series_ids[start:stop, None], windows, np.nan)
+            enough = (~np.isnan(windows)).sum(axis=1) >= min_periods
+            median = np.nanmedian(windows, axis=1)
+            mad = np.nanmedian(np.abs(windows - median[:, None]), axis=1)
+            medians[start:stop] = np.where(enough, median, np.nan)
+            mads[start:stop] = np.where(enough, mad, np.nan)
+    return medians, mads
+
+
+def robust_z(values, medians, mads):
+    """穩健 z 分數：(值 - 中位數) / (1.4826 × MAD)"""
+    scale = MAD_SCALE * np.maximum(mads, MIN_MAD_RATIO * np.abs(medians))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(scale > 0, (values - medians) / scale, np.nan)
+
+
+class AnomalyDetector:
+    """以滾動中位數 / MAD 的穩健 z 分數標記各作物×市場的異常價格與交易量
+
+    價格以當日平均價計算；交易量取 log(1 + 交易量) 後計算，只標記暴增。
+    第一次使用時批次計算全部歷史，之後新交易日只需帶入各序列最後 window 筆一起計算。
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, min_periods=MIN_PERIODS, threshold=Z_THRESHOLD):
+        self.window = window
+        self.min_periods = min_periods
+        self.threshold = threshold
+        self.scores = None
+        self.last_date = None
+
+    def fit(self, analyzer):
+        """計算分析器中所有觀測值的異常分數"""
+        self.scores = self.score(build_observations(analyzer.aggregate_cube.cells))
+        self.last_date = self.scores['日期'].max() if len(self.scores) else None
+        return self
+
+    def score(self, observations):
+        """對觀測值計算穩健 z 分數與異常標記（依作物、市場、日期排序後回傳）"""
+        obs = observations.sort_values(['作物名稱', '市場名稱', '日期'], kind='mergesort', ignore_index=True)
+        crops = obs['作物名稱'].to_numpy()
+        markets = obs['市場名稱'].to_numpy()
+        boundary = np.ones(len(obs), dtype=bool)
+        boundary[1:] = (crops[1:] != crops[:-1]) | (markets[1:] != markets[:-1])
+        series_ids = np.cumsum(boundary)
+
+        prices = obs['平均價'].to_numpy(dtype='float64')
+        volumes = obs['交易量'].to_numpy(dtype='float64')
+        log_volumes = np.log1p(np.maximum(volumes, 0))
+        price_median, price_mad = rolling_median_mad(prices, series_ids, self.window, self.min_periods)
+        volume_median, volume_mad = rolling_median_mad(log_volumes, series_ids, self.window, self.min_periods)
+        price_z = robust_z(prices, price_median, price_mad)
+        volume_z = robust_z(log_volumes, volume_median, volume_mad)
+
+        price_high = price_z >= self.threshold
+        price_low = price_z <= -self.threshold
+        volume_spike = volume_z >= self.threshold
+        kinds = np.where(price_high, '價格偏高', np.where(price_low, '價格偏低', ''))
+        kinds = np.where(volume_spike, np.where(kinds == '', '交易量暴增', np.char.add(kinds, '、交易量暴增')), kinds)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            volume_ratio = volumes / np.expm1(volume_median)
+        return obs.assign(
+            價格中位數=price_median,
+            價格z分數=price_z,
+            交易量中位數=np.expm1(volume_median),
+            交易量倍數=volume_ratio,
+            交易量z分數=volume_z,
+            異常分數=np.fmax(np.abs(price_z), volume_z),
+            異常類型=kinds,
+            是否異常=price_high | price_low | volume_spike,
+        )
+
+    def update(self, analyzer):
+        """加入分析器中最後計算日期之後的交易日，只重新計算新的觀測值"""
+        if self.scores is None:
+            return self.fit(analyzer)
+        cells = analyzer.aggregate_cube.cells
+        new_obs = build_observations(cells[cells['日期'] > self.last_date])
+        if len(new_obs) == 0:
+            return self
+
+        # 每條序列最後 window 筆作為新觀測值的滾動歷史
+        history = self.scores.groupby(['作物名稱', '市場名稱'], sort=False).tail(self.window)
+        scored = self.score(pd.concat([history[OBSERVATION_COLUMNS], new_obs], ignore_index=True))
+        scored = scored[scored['日期'] > self.last_date]
+        self.scores = pd.concat([self.scores, scored], ignore_index=True)
+        self.last_date = scored['日期'].max()
+        return self
+
+    def covers(self, analyzer):
+        """是否涵蓋分析器在最後計算日期前的所有作物×市場序列與起始日期，可沿用分數"""
+        if self.scores is None or len(self.scores) == 0:
+            return False
+        cells = analyzer.aggregate_cube.cells
+        if cells['日期'].min() < self.scores['日期'].min():
+            return False
+        known = cells[cells['日期'] <= self.last_date]
+        series = pd.MultiIndex.from_arrays([known['作物名稱'].astype(object), known['市場名稱'].astype(object)])
+        scored = pd.MultiIndex.from_arrays([self.scores['作物名稱'], self.scores['市場名稱']])
+        return bool(series.unique().isin(scored.unique()).all())
+
+    def adopt(self, previous, analyzer):
+        """沿用前一個偵測器的分數，以新的交易日增量更新，並移除已不在資料範圍內的觀測值"""
+        self.scores = previous.scores
+        self.last_date = previous.last_date
+        self.update(analyzer)
+        first_date = analyzer.aggregate_cube.cells['日期'].min()
+        keep = (self.scores['日期'] >= first_date) & self.scores['作物名稱'].isin(analyzer.crop_index)
+        self.scores = self.scores[keep.to_numpy()].reset_index(drop=True)
+        return self
+
+    def get_anomalies(self, start_date=None, end_date=None, limit=None):
+        """取得日期範圍內（含頭尾）被標記的觀測值，依異常分數由高到低排序"""
+        scores = self.scores
+        mask = scores['是否異常'].to_numpy().copy()
+        if start_date is not None:
+            mask &= (scores['日期'] >= pd.Timestamp(start_date)).to_numpy()
+        if end_date is not None:
+            mask &= (scores['日期'] <= pd.Timestamp(end_date)).to_numpy()
+        anomalies = scores[mask].sort_values('異常分數', ascending=False, kind='mergesort', ignore_index=True)
+        return anomalies if limit is None else anomalies.head(limit)
+
+    def get_latest_anomalies(self, limit=None):
+        """取得最新交易日被標記的觀測值（今日異常）"""
+        if self.last_date is None:
+            return self.scores.iloc[0:0] if self.scores is not None else pd.DataFrame()
+        return self.get_anomalies(self.last_date, self.last_date, limit)
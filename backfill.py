@@ -0,0 +1,186 @@
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import pandas as pd
+from data_ingest import FARM_TRANS_HOST, fetch_farm_data
+from date_utils import to_roc_date
+from history_store import HistoryStore
+from http_client import get_http_client
+from retry_policy import RetryPolicy
+
+# 回補進度檔，中斷後可從此處繼續
+CHECKPOINT_FILE = os.path.join('data', 'backfill_checkpoint.json')
+
+# 每頁筆數（$top / $skip 分頁）
+PAGE_SIZE = 1000
+
+
+class RateLimiter:
+    """權杖桶限速器，限制每秒送出的請求數"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate))
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取得一個權杖，必要時等待"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class BackfillJob:
+    """將長日期範圍切成區段並行下載，寫入本地歷史資料庫"""
+
+    def __init__(self, session, store, start_date, end_date, chunk_days=7,
+                 max_workers=4, requests_per_second=2, page_size=PAGE_SIZE,
+                 checkpoint_path=CHECKPOINT_FILE, progress_callback=None,
+                 retry_policy=None):
+        self.session = session
+        self.store = store
+        self.start_date = pd.Timestamp(start_date).normalize()
+        self.end_date = pd.Timestamp(end_date).normalize()
+        if self.start_date > self.end_date:
+            raise ValueError("起始日期不可晚於結束日期")
+        self.chunk_days = chunk_days
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.checkpoint_path = checkpoint_path
+        self.progress_callback = progress_callback
+        self.retry_policy = retry_policy or RetryPolicy()
+
+    def split_chunks(self):
+        """將日期範圍切成多個區段"""
+        chunks = []
+        chunk_start = self.start_date
+        while chunk_start <= self.end_date:
+            chunk_end = min(chunk_start + timedelta(days=self.chunk_days - 1), self.end_date)
+            chunks.append((chunk_start, chunk_end))
+            chunk_start = chunk_end + timedelta(days=1)
+        return chunks
+
+    def chunk_key(self, chunk):
+        """區段在進度檔中的鍵值"""
+        start, end = chunk
+        return f"{start:%Y-%m-%d}~{end:%Y-%m-%d}"
+
+    def fetch_chunk(self, chunk):
+        """以分頁方式下載單一區段的所有資料"""
+        start, end = chunk
+        frames = []
+        skip = 0
+        while True:
+            self.rate_limiter.acquire()
+            params = {
+                'StartDate': to_roc_date(start),
+                'EndDate': to_roc_date(end),
+                '$top': self.page_size,
+                '$skip': skip,
+            }
+            page = self.retry_policy.call(fetch_farm_data, self.session, params=params,
+                                          host=FARM_TRANS_HOST)
+            if len(page) > 0:
+                frames.append(page)
+            if len(page) < self.page_size:
+                break
+            skip += self.page_size
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def load_checkpoint(self):
+        """讀取已完成的區段"""
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                return set(json.load(f).get('completed', []))
+        except (OSError, ValueError):
+            return set()
+
+    def save_checkpoint(self, completed):
+        """儲存已完成的區段（先寫暫存檔再取代）"""
+        os.makedirs(os.path.dirname(self.checkpoint_path) or '.', exist_ok=True)
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'completed': sorted(completed),
+                'updated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def run(self):
+        """執行回補，回傳結果摘要"""
+        completed = self.load_checkpoint()
+        pending = [chunk for chunk in self.split_chunks() if self.chunk_key(chunk) not in completed]
+        failures = {}
+        written_dates = []
+
+        if not pending:
+            return {'completed': 0, 'failed': failures, 'dates_written': written_dates}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.fetch_chunk, chunk): chunk for chunk in pending}
+            for done, future in enumerate(as_completed(futures), 1):
+                key = self.chunk_key(futures[future])
+                error = None
+                try:
+                    # 寫入資料庫與進度檔都在主執行緒進行
+                    written_dates.extend(self.store.append(future.result()))
+                    completed.add(key)
+                    self.save_checkpoint(completed)
+                except Exception as e:
+                    error = str(e)
+                    failures[key] = error
+                if self.progress_callback:
+                    self.progress_callback(done, len(pending), key, error)
+
+        return {
+            'completed': len(pending) - len(failures),
+            'failed': failures,
+            'dates_written': sorted(written_dates),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回補農產品交易歷史資料")
+    parser.add_argument('--start', required=True, help="起始日期（YYYY-MM-DD）")
+    parser.add_argument('--end', default=datetime.now().strftime('%Y-%m-%d'), help="結束日期（YYYY-MM-DD）")
+    parser.add_argument('--chunk-days', type=int, default=7, help="每個區段的天數")
+    parser.add_argument('--workers', type=int, default=4, help="並行下載數")
+    parser.add_argument('--rate', type=float, default=2, help="每秒請求數上限")
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE, help="進度檔路徑")
+    args = parser.parse_args()
+
+    def report_progress(done, total, key, error):
+        if error:
+            print(f"[{done}/{total}] {key} 失敗：{error}")
+        else:
+            print(f"[{done}/{total}] {key} 完成")
+
+    job = BackfillJob(get_http_client(), HistoryStore(), args.start, args.end,
+                      chunk_days=args.chunk_days, max_workers=args.workers,
+                      requests_per_second=args.rate, checkpoint_path=args.checkpoint,
+                      progress_callback=report_progress)
+    result = job.run()
+    print(f"完成 {result['completed']} 個區段，新增 {len(result['dates_written'])} 個交易日")
+    if result['failed']:
+        print(f"{len(result['failed'])} 個區段失敗，重新執行即可從中斷處繼續")
+
+
+if __name__ == "__main__":
+    main()
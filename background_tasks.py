@@ -0,0 +1,132 @@
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 主執行緒檢查結果佇列的間隔（毫秒）
+POLL_INTERVAL_MS = 100
+
+
+class TaskCancelled(Exception):
+    """背景工作已被取消"""
+
+
+class TaskHandle:
+    """背景工作的控制代碼，供工作回報進度與檢查是否已取消"""
+
+    def __init__(self, task_id, name, results):
+        self.task_id = task_id
+        self.name = name
+        self.results = results
+        self.cancel_event = threading.Event()
+        self.done = False
+
+    @property
+    def cancelled(self):
+        """是否已要求取消"""
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        """要求取消工作，工作會在下一個檢查點結束"""
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        """已要求取消時拋出 TaskCancelled"""
+        if self.cancel_event.is_set():
+            raise TaskCancelled(self.name)
+
+    def report_progress(self, message):
+        """回報進度訊息（可在背景執行緒呼叫）"""
+        self.results.put((self.task_id, 'progress', message))
+
+
+class BackgroundTaskRunner:
+    """在背景執行緒執行工作，並透過 Tk 的 after 迴圈在主執行緒處理結果
+
+    工作函式的第一個參數為 TaskHandle；工作內不可直接操作 Tk 元件，
+    介面更新一律放在 on_success / on_error / on_progress / on_cancel 回呼中。
+    """
+
+    def __init__(self, root, max_workers=2, poll_interval=POLL_INTERVAL_MS):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.results = queue.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="background-task")
+        self.tasks = {}
+        self.ids = itertools.count(1)
+        self.poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, func, *args, name=None, on_success=None, on_error=None,
+               on_progress=None, on_cancel=None, **kwargs):
+        """提交背景工作，回傳 TaskHandle"""
+        handle = TaskHandle(next(self.ids), name or func.__name__, self.results)
+        self.tasks[handle.task_id] = (handle, on_success, on_error, on_progress, on_cancel)
+        self.executor.submit(self._run, handle, func, args, kwargs)
+        return handle
+
+    def cancel_all(self):
+        """取消所有執行中的工作"""
+        for handle, *_ in self.tasks.values():
+            handle.cancel()
+
+    def shutdown(self):
+        """取消所有工作、停止輪詢並關閉執行緒池（尚未開始的工作直接捨棄）"""
+        self.cancel_all()
+        if self.poll_id is not None:
+            self.root.after_cancel(self.poll_id)
+            self.poll_id = None
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, handle, func, args, kwargs):
+        """在背景執行緒執行工作並將結果放入佇列"""
+        try:
+            result = func(handle, *args, **kwargs)
+            self.results.put((handle.task_id, 'success', result))
+        except TaskCancelled:
+            self.results.put((handle.task_id, 'cancelled', None))
+        except Exception as e:
+            self.results.put((handle.task_id, 'error', e))
+
+    def _poll(self):
+        """在主執行緒處理佇列中的結果"""
+        try:
+            while True:
+                task_id, kind, payload = self.results.get_nowait()
+                self._dispatch(task_id, kind, payload)
+        except queue.Empty:
+            pass
+        finally:
+            if self.poll_id is not None:
+                self.poll_id = self.root.after(self.poll_interval, self._poll)
+
+    def _dispatch(self, task_id, kind, payload):
+        """依結果類型呼叫對應的回呼"""
+        entry = self.tasks.get(task_id)
+        if entry is None:
+            return
+        handle, on_success, on_error, on_progress, on_cancel = entry
+
+        if kind == 'progress':
+            if on_progress and not handle.cancelled:
+                self._safe_call(on_progress, payload)
+            return
+
+        del self.tasks[task_id]
+        handle.done = True
+        # 已取消的工作即使完成也不套用結果
+        if handle.cancelled or kind == 'cancelled':
+            if on_cancel:
+                self._safe_call(on_cancel)
+        elif kind == 'success':
+            if on_success:
+                self._safe_call(on_success, payload)
+        elif on_error:
+            self._safe_call(on_error, payload)
+
+    def _safe_call(self, callback, *args):
+        """執行回呼，避免單一回呼的錯誤中斷輪詢"""
+        try:
+            callback(*args)
+        except Exception as e:
+            print(f"執行背景工作回呼時發生錯誤：{str(e)}")
@@ -0,0 +1,161 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+import pandas as pd
+from forecasting import (FORECAST_MODELS, ExponentialSmoothingForecaster,
+                         fit_trend_month_models, forecast_trend_month)
+
+# 回測報告輸出資料夾
+REPORT_DIR = os.path.join('output', 'backtest')
+
+# 每個平行工作處理的作物數
+CROPS_PER_CHUNK = 100
+
+
+def fit_and_forecast(model, train, days):
+    """擬合單一模型並預測，回傳 (預測表, 擬合秒數, 預測秒數)"""
+    started = time.perf_counter()
+    if model == 'linear':
+        fitted = fit_trend_month_models(train)
+    else:
+        seasonal = model == 'holt_winters'
+        fitted = ExponentialSmoothingForecaster(trend=seasonal, seasonal=seasonal).fit(train)
+    fitted_at = time.perf_counter()
+    if model == 'linear':
+        forecast = forecast_trend_month(fitted, days)
+    else:
+        forecast = fitted.forecast(days)
+    return forecast, fitted_at - started, time.perf_counter() - fitted_at
+
+
+def backtest_chunk(data, origins, models, horizon):
+    """對一組作物做滾動起點回測，回傳 (每筆預測誤差, 執行時間)"""
+    actual = data.groupby(['作物名稱', '日期'], observed=True)['平均價'].mean().rename('實際價格').reset_index()
+    actual['作物名稱'] = actual['作物名稱'].astype(object)
+    n_crops = actual['作物名稱'].nunique()
+
+    errors = []
+    timings = []
+    for origin in origins:
+        train = data[data['日期'] <= origin]
+        if len(train) == 0:
+            continue
+        target = actual[(actual['日期'] > origin) & (actual['日期'] <= origin + pd.Timedelta(days=horizon))]
+        for model in models:
+            forecast, fit_seconds, predict_seconds = fit_and_forecast(model, train, horizon)
+            timings.append({'模型': model, '起點': origin, '作物數': n_crops,
+                            '擬合秒數': fit_seconds, '預測秒數': predict_seconds})
+
+            merged = target.merge(forecast, on=['作物名稱', '日期'], how='inner')
+            merged['模型'] = model
+            merged['起點'] = origin
+            merged['預測天數'] = (merged['日期'] - origin).dt.days
+            errors.append(merged)
+
+    if not errors:
+        return pd.DataFrame(), pd.DataFrame(timings)
+    return pd.concat(errors, ignore_index=True), pd.DataFrame(timings)
+
+
+class ForecastBacktest:
+    """以滾動起點重播歷史資料，比較各預測模型的準確度與速度"""
+
+    def __init__(self, analyzer, models=None, horizon=7, n_origins=8, origin_step=7,
+                 crops_per_chunk=CROPS_PER_CHUNK, max_workers=None, progress_callback=None):
+        self.analyzer = analyzer
+        self.models = list(models or FORECAST_MODELS)
+        self.horizon = horizon
+        self.n_origins = n_origins
+        self.origin_step = origin_step
+        self.crops_per_chunk = crops_per_chunk
+        self.max_workers = max_workers
+        self.progress_callback = progress_callback
+
+    def get_origins(self):
+        """預測起點：最後一個可完整驗證的日期往前，每 origin_step 天一個"""
+        last_date = self.analyzer.data['日期'].max()
+        latest_origin = last_date - pd.Timedelta(days=self.horizon)
+        origins = [latest_origin - pd.Timedelta(days=self.origin_step * i) for i in range(self.n_origins)]
+        first_date = self.analyzer.data['日期'].min()
+        return sorted(origin for origin in origins if origin > first_date)
+
+    def split_chunks(self):
+        """依作物索引把資料切成連續的作物區塊"""
+        crops = self.analyzer.get_crop_names()
+        chunks = []
+        for i in range(0, len(crops), self.crops_per_chunk):
+            group = crops[i:i + self.crops_per_chunk]
+            start = self.analyzer.crop_index[group[0]][0]
+            stop = self.analyzer.crop_index[group[-1]][1]
+            chunks.append(self.analyzer.data.iloc[start:stop])
+        return chunks
+
+    def run(self):
+        """執行回測，回傳 (準確度摘要, 執行時間摘要)"""
+        origins = self.get_origins()
+        if not origins:
+            raise ValueError("資料期間太短，無法進行回測")
+        chunks = self.split_chunks()
+
+        errors = []
+        timings = []
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(backtest_chunk, chunk, origins, self.models, self.horizon)
+                       for chunk in chunks]
+            for done, future in enumerate(as_completed(futures), 1):
+                chunk_errors, chunk_timings = future.result()
+                errors.append(chunk_errors)
+                timings.append(chunk_timings)
+                if self.progress_callback:
+                    self.progress_callback(done, len(futures))
+
+        return self.summarize_accuracy(pd.concat(errors, ignore_index=True)), \
+            self.summarize_timing(pd.concat(timings, ignore_index=True))
+
+    def summarize_accuracy(self, errors):
+        """計算各模型、各預測天數的 MAE 與 MAPE"""
+        if len(errors) == 0:
+            return pd.DataFrame(columns=['模型', '預測天數', 'MAE', 'MAPE(%)', '樣本數'])
+        errors = errors.assign(
+            絕對誤差=(errors['預測價格'] - errors['實際價格']).abs(),
+            百分比誤差=((errors['預測價格'] - errors['實際價格']).abs()
+                   / errors['實際價格'].where(errors['實際價格'] > 0)) * 100,
+        )
+        summary = errors.groupby(['模型', '預測天數']).agg(
+            MAE=('絕對誤差', 'mean'),
+            MAPE=('百分比誤差', 'mean'),
+            樣本數=('絕對誤差', 'size'),
+        ).reset_index().rename(columns={'MAPE': 'MAPE(%)'})
+        return summary.round({'MAE': 4, 'MAPE(%)': 2})
+
+    def summarize_timing(self, timings):
+        """計算各模型的擬合與預測時間及每秒可處理的作物數"""
+        summary = timings.groupby('模型').agg(
+            擬合秒數=('擬合秒數', 'sum'),
+            預測秒數=('預測秒數', 'sum'),
+            作物次數=('作物數', 'sum'),
+        ).reset_index()
+        total = summary['擬合秒數'] + summary['預測秒數']
+        summary['每秒作物數'] = (summary['作物次數'] / total.where(total > 0)).round(1)
+        return summary.round({'擬合秒數': 4, '預測秒數': 4})
+
+
+def compare_with_baseline(accuracy, baseline_path):
+    """與先前的回測報告比較 MAE，方便發現準確度退步"""
+    baseline = pd.read_csv(baseline_path, encoding='utf-8-sig')
+    merged = accuracy.merge(baseline[['模型', '預測天數', 'MAE']], on=['模型', '預測天數'],
+                            how='left', suffixes=('', '_基準'))
+    merged['MAE變化(%)'] = ((merged['MAE'] / merged['MAE_基準'] - 1) * 100).round(2)
+    return merged
+
+
+def write_report(accuracy, timing, output_dir=REPORT_DIR):
+    """將回測結果寫成 CSV，回傳檔案路徑"""
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    accuracy_path = os.path.join(output_dir, f"回測準確度_{stamp}.csv")
+    timing_path = os.path.join(output_dir, f"回測執行時間_{stamp}.csv")
+    accuracy.to_csv(accuracy_path, index=False, encoding='utf-8-sig')
+    timing.to_csv(timing_path, index=False, encoding='utf-8-sig')
+    return accuracy_path, timing_path
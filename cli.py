@@ -0,0 +1,269 @@
+"""無介面的資料擷取與分析工具，可在伺服器或排程中執行
+
+不匯入 tkinter / ttkthemes / tkcalendar。
+
+範例：
+    python cli.py fetch
+    python cli.py summary --days 30 --output output/summary.csv
+    python cli.py summary --days 1 --by-region --output output/summary.xlsx
+    python cli.py export --crop 甘藍-初秋 --format excel
+    python cli.py alerts
+    python cli.py anomalies --days 90 --limit 20
+    python cli.py forecast --horizon 7 --output output/forecast.csv
+    python cli.py backtest --days 730 --origins 12
+    python cli.py run
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+# 沒有顯示器時使用非互動式的繪圖後端
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from analysis_utils import DataAnalyzer
+from backfill import BackfillJob
+from backtest import REPORT_DIR, ForecastBacktest, compare_with_baseline, write_report
+from data_ingest import FARM_TRANS_HOST, fetch_farm_data
+from forecasting import FORECAST_MODELS, SEASONAL_HISTORY_DAYS
+from history_store import HistoryStore
+from http_cache import ResponseCache
+from http_client import get_http_client
+from retry_policy import RetryPolicy
+
+OUTPUT_DIR = "output"
+
+
+def fetch_latest(args):
+    """下載最新行情並寫入歷史資料庫，回傳新增的交易日"""
+    cache = None if args.no_cache else ResponseCache()
+    data = RetryPolicy().call(fetch_farm_data, get_http_client(), cache=cache,
+                              host=FARM_TRANS_HOST)
+    new_dates = HistoryStore().append(data)
+    print(f"下載 {len(data)} 筆資料，新增 {len(new_dates)} 個交易日")
+    return new_dates
+
+
+def load_analyzer(args):
+    """依參數從歷史資料庫建立分析器"""
+    store = HistoryStore()
+    if args.start or args.end:
+        data = store.load(start_date=args.start, end_date=args.end)
+    else:
+        data = store.load_recent(args.days)
+    if len(data) == 0:
+        raise Exception("歷史資料庫中沒有可用的資料，請先執行 fetch 或 backfill")
+    analyzer = DataAnalyzer(data, compact=True)
+    print(analyzer.format_memory_report())
+    return analyzer
+
+
+def write_summary(analyzer, output, by_region=False):
+    """計算所有作物（可依區域細分）統計並輸出"""
+    summary = analyzer.get_market_summary(by_region=by_region)
+    if output:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        analyzer.export_market_summary(summary, output)
+        print(f"已輸出 {summary['作物名稱'].nunique()} 種作物的統計至 {output}")
+    else:
+        print(summary.to_string(index=False))
+    return summary
+
+
+def export_crops(analyzer, crops, file_format, output_dir):
+    """匯出指定作物的分析報告"""
+    os.makedirs(output_dir, exist_ok=True)
+    for crop_name in crops:
+        if file_format == 'excel':
+            filename = os.path.join(output_dir, f"{crop_name}_分析報告.xlsx")
+            analyzer.export_to_excel(crop_name, filename)
+        else:
+            filename = os.path.join(output_dir, f"{crop_name}_資料.csv")
+            analyzer.export_to_csv(crop_name, filename)
+        print(f"已匯出 {filename}")
+
+
+def check_alerts(analyzer):
+    """以最新價格檢查價格預警"""
+    from price_alert import PriceAlertSystem
+    alert_system = PriceAlertSystem()
+    triggered = alert_system.check_prices(analyzer.get_latest_prices())
+    print(f"觸發 {len(triggered)} 項價格預警")
+    anomalies = analyzer.get_anomaly_detector().get_latest_anomalies()
+    alert_system.check_anomalies(anomalies, background=False)
+    print(f"最新交易日有 {len(anomalies)} 筆價格或交易量異常")
+    return triggered
+
+
+def write_anomalies(analyzer, output, all_dates=False, limit=None):
+    """輸出異常觀測值（預設為最新交易日），依異常分數排序"""
+    detector = analyzer.get_anomaly_detector()
+    anomalies = detector.get_anomalies(limit=limit) if all_dates else detector.get_latest_anomalies(limit)
+    anomalies = anomalies.round(dict.fromkeys(anomalies.select_dtypes('number').columns, 2))
+    if output:
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        anomalies.to_csv(output, index=False, encoding='utf-8-sig')
+        print(f"已輸出 {len(anomalies)} 筆異常至 {output}")
+    else:
+        print(anomalies.to_string(index=False))
+    return anomalies
+
+
+def cmd_fetch(args):
+    fetch_latest(args)
+
+
+def cmd_summary(args):
+    write_summary(load_analyzer(args), args.output, args.by_region)
+
+
+def cmd_export(args):
+    analyzer = load_analyzer(args)
+    crops = args.crop or sorted(analyzer.get_crop_names())
+    export_crops(analyzer, crops, args.format, args.output_dir)
+
+
+def cmd_alerts(args):
+    check_alerts(load_analyzer(args))
+
+
+def cmd_anomalies(args):
+    write_anomalies(load_analyzer(args), args.output, args.all_dates, args.limit)
+
+
+def cmd_forecast(args):
+    forecast = load_analyzer(args).predict_all_prices(args.horizon)
+    forecast = forecast.assign(預測價格=forecast['預測價格'].round(2))
+    output = args.output or os.path.join(OUTPUT_DIR, f"價格預測_{datetime.now():%Y%m%d}.csv")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    forecast.to_csv(output, index=False, encoding='utf-8-sig')
+    print(f"已輸出 {forecast['作物名稱'].nunique()} 種作物未來 {args.horizon} 天的預測至 {output}")
+
+
+def cmd_backtest(args):
+    def report_progress(done, total):
+        print(f"[{done}/{total}] 作物區塊回測完成")
+
+    backtest = ForecastBacktest(load_analyzer(args), models=args.model, horizon=args.horizon,
+                                n_origins=args.origins, origin_step=args.step,
+                                max_workers=args.workers, progress_callback=report_progress)
+    accuracy, timing = backtest.run()
+    if args.baseline:
+        accuracy = compare_with_baseline(accuracy, args.baseline)
+    print(accuracy.to_string(index=False))
+    print(timing.to_string(index=False))
+    accuracy_path, timing_path = write_report(accuracy, timing, args.output_dir)
+    print(f"已輸出回測報告至 {accuracy_path}、{timing_path}")
+
+
+def cmd_backfill(args):
+    def report_progress(done, total, key, error):
+        print(f"[{done}/{total}] {key} " + (f"失敗：{error}" if error else "完成"))
+
+    job = BackfillJob(get_http_client(), HistoryStore(), args.start, args.end,
+                      chunk_days=args.chunk_days, max_workers=args.workers,
+                      requests_per_second=args.rate, progress_callback=report_progress)
+    result = job.run()
+    print(f"完成 {result['completed']} 個區段，新增 {len(result['dates_written'])} 個交易日")
+    if result['failed']:
+        raise Exception(f"{len(result['failed'])} 個區段失敗，重新執行即可從中斷處繼續")
+
+
+def cmd_run(args):
+    """每日批次：下載、分析、匯出並檢查預警"""
+    fetch_latest(args)
+    analyzer = load_analyzer(args)
+    stamp = datetime.now().strftime('%Y%m%d')
+    write_summary(analyzer, os.path.join(args.output_dir, f"市場統計_{stamp}.csv"))
+    if args.crop:
+        export_crops(analyzer, args.crop, args.format, args.output_dir)
+    check_alerts(analyzer)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="農產品交易資料無介面工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_range_arguments(sub, days=365):
+        sub.add_argument('--days', type=int, default=days, help="載入最近幾天的資料")
+        sub.add_argument('--start', help="起始日期（YYYY-MM-DD），指定時忽略 --days")
+        sub.add_argument('--end', help="結束日期（YYYY-MM-DD）")
+
+    sub = subparsers.add_parser('fetch', help="下載最新行情並寫入歷史資料庫")
+    sub.add_argument('--no-cache', action='store_true', help="不使用回應快取")
+    sub.set_defaults(func=cmd_fetch)
+
+    sub = subparsers.add_parser('summary', help="計算所有作物的統計")
+    add_range_arguments(sub)
+    sub.add_argument('--output', help="輸出路徑（.csv 或 .xlsx），未指定時直接顯示")
+    sub.add_argument('--by-region', action='store_true', help="依作物 × 區域分列統計")
+    sub.set_defaults(func=cmd_summary)
+
+    sub = subparsers.add_parser('export', help="匯出作物分析報告")
+    add_range_arguments(sub)
+    sub.add_argument('--crop', action='append', help="作物名稱，可重複指定；未指定時匯出全部")
+    sub.add_argument('--format', choices=['excel', 'csv'], default='csv')
+    sub.add_argument('--output-dir', default=OUTPUT_DIR)
+    sub.set_defaults(func=cmd_export)
+
+    sub = subparsers.add_parser('alerts', help="檢查價格預警")
+    add_range_arguments(sub)
+    sub.set_defaults(func=cmd_alerts)
+
+    sub = subparsers.add_parser('anomalies', help="列出價格或交易量異常的作物×市場")
+    add_range_arguments(sub)
+    sub.add_argument('--all-dates', action='store_true', help="列出期間內所有異常，預設只列最新交易日")
+    sub.add_argument('--limit', type=int, help="最多列出的筆數")
+    sub.add_argument('--output', help="輸出 CSV 路徑，未指定時直接顯示")
+    sub.set_defaults(func=cmd_anomalies)
+
+    sub = subparsers.add_parser('forecast', help="預測所有作物的未來價格")
+    # Holt-Winters 需要兩年資料才會啟用年季節
+    add_range_arguments(sub, days=SEASONAL_HISTORY_DAYS)
+    sub.add_argument('--horizon', type=int, default=7, help="預測天數")
+    sub.add_argument('--output', help="輸出 CSV 路徑")
+    sub.set_defaults(func=cmd_forecast)
+
+    sub = subparsers.add_parser('backtest', help="以歷史資料回測預測模型的準確度與速度")
+    add_range_arguments(sub, days=SEASONAL_HISTORY_DAYS)
+    sub.add_argument('--model', action='append', choices=list(FORECAST_MODELS),
+                     help="要回測的模型，可重複指定；未指定時回測全部")
+    sub.add_argument('--horizon', type=int, default=7, help="預測天數")
+    sub.add_argument('--origins', type=int, default=8, help="預測起點數量")
+    sub.add_argument('--step', type=int, default=7, help="預測起點的間隔天數")
+    sub.add_argument('--workers', type=int, help="平行處理的行程數")
+    sub.add_argument('--baseline', help="先前的回測準確度報告，用於比較 MAE 變化")
+    sub.add_argument('--output-dir', default=REPORT_DIR)
+    sub.set_defaults(func=cmd_backtest)
+
+    sub = subparsers.add_parser('backfill', help="回補歷史資料")
+    sub.add_argument('--start', required=True, help="起始日期（YYYY-MM-DD）")
+    sub.add_argument('--end', default=datetime.now().strftime('%Y-%m-%d'), help="結束日期（YYYY-MM-DD）")
+    sub.add_argument('--chunk-days', type=int, default=7)
+    sub.add_argument('--workers', type=int, default=4)
+    sub.add_argument('--rate', type=float, default=2)
+    sub.set_defaults(func=cmd_backfill)
+
+    sub = subparsers.add_parser('run', help="每日批次：下載、統計、匯出、預警")
+    add_range_arguments(sub)
+    sub.add_argument('--no-cache', action='store_true', help="不使用回應快取")
+    sub.add_argument('--crop', action='append', help="需要匯出報告的作物，可重複指定")
+    sub.add_argument('--format', choices=['excel', 'csv'], default='csv')
+    sub.add_argument('--output-dir', default=OUTPUT_DIR)
+    sub.set_defaults(func=cmd_run)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except Exception as e:
+        print(f"執行 {args.command} 時發生錯誤：{str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+# 計算相關係數所需的最少共同交易日數
+MIN_PERIODS = 2
+
+# 相關係數矩陣的磁碟快取
+CACHE_DIR = os.path.join('data', 'cache')
+CORRELATION_CACHE_FILE = os.path.join(CACHE_DIR, 'crop_correlation.npz')
+
+# 增量更新次數上限，超過後重新完整計算以避免浮點誤差累積
+MAX_INCREMENTAL_UPDATES = 60
+
+SUM_KEYS = ('n', 'sum_x', 'sum_xy', 'sum_xx')
+
+
+def build_price_matrix(data):
+    """將交易資料轉為日期 × 作物的每日平均價矩陣，沒有交易的日期為 NaN"""
+    daily = data.groupby(['日期', '作物名稱'], observed=True)['平均價'].mean()
+    return daily.unstack('作物名稱').sort_index().astype('float64')
+
+
+def column_shift(values):
+    """各作物的平移量（平均價），減去後再累加可降低浮點數相消誤差"""
+    if len(values) == 0:
+        return np.zeros(values.shape[1])
+    with np.errstate(invalid='ignore'):
+        return np.nan_to_num(np.nanmean(values, axis=0))
+
+
+def cross_sums(left, left_shift, right, right_shift):
+    """計算 left 與 right 兩組作物在共同交易日上的累加值
+
+    n 為共同交易日數，sum_x / sum_xx 為 left 的 Σx / Σx²，sum_y / sum_yy 為
+    right 的 Σy / Σy²，sum_xy 為 Σxy；全部以矩陣乘法一次算出所有作物組合。
+    """
+    left_mask = ~np.isnan(left)
+    right_mask = ~np.isnan(right)
+    left_values = np.where(left_mask, left - left_shift, 0.0)
+    right_values = np.where(right_mask, right - right_shift, 0.0)
+    left_present = left_mask.astype('float64')
+    right_present = right_mask.astype('float64')
+    return {
+        'n': left_present.T @ right_present,
+        'sum_x': left_values.T @ right_present,
+        'sum_y': left_present.T @ right_values,
+        'sum_xy': left_values.T @ right_values,
+        'sum_xx': (left_values * left_values).T @ right_present,
+        'sum_yy': left_present.T @ (right_values * right_values),
+    }
+
+
+def pairwise_sums(values, shift=None):
+    """計算同一組作物兩兩之間的累加值（Σy、Σy² 分別為 Σx、Σx² 的轉置）"""
+    values = np.asarray(values, dtype='float64')
+    if shift is None:
+        shift = column_shift(values)
+    sums = cross_sums(values, shift, values, shift)
+    return {key: sums[key] for key in SUM_KEYS}
+
+
+def correlation_from_sums(sums, min_periods=MIN_PERIODS):
+    """由累加值計算成對完整（pairwise-complete）的皮爾森相關係數矩陣"""
+    n = sums['n']
+    sum_x = sums['sum_x']
+    sum_y = sum_x.T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = sums['sum_xy'] - sum_x * sum_y / n
+        var_x = sums['sum_xx'] - sum_x * sum_x / n
+        var_y = var_x.T
+        correlation = cov / np.sqrt(var_x * var_y)
+    invalid = (n < min_periods) | (var_x <= 0) | (var_y <= 0)
+    correlation[invalid] = np.nan
+    return np.clip(correlation, -1.0, 1.0)
+
+
+def add_sums(base, delta, sign=1):
+    """將 delta 的累加值加到（sign=-1 時為減去）base"""
+    return {key: base[key] + sign * delta[key] for key in SUM_KEYS}
+
+
+class CropSimilarityEngine:
+    """以日期 × 作物價格矩陣一次計算所有作物之間的價格相關係數
+
+    指定 cache_path 時會將累加值與價格矩陣存到磁碟：資料版本相同時直接沿用，
+    新增或修正交易日時只以差異的日期增減累加值，不需重新計算整個矩陣。
+    """
+
+    def __init__(self, data=None, min_periods=MIN_PERIODS, cache_path=None, version=None):
+        self.min_periods = min_periods
+        self.cache_path = cache_path
+        self.crops = []
+        self.positions = {}
+        self.correlation = np.empty((0, 0))
+        self.last_update = None
+        if data is not None:
+            self.fit(data, version=version)
+
+    def fit(self, data, version=None):
+        """由交易資料建立相關係數矩陣"""
+        return self.fit_matrix(build_price_matrix(data), version=version)
+
+    def fit_matrix(self, price_matrix, version=None):
+        """由日期 × 作物價格矩陣建立相關係數矩陣，有快取時以增量方式更新"""
+        crops = list(price_matrix.columns)
+        dates = price_matrix.index.to_numpy(dtype='datetime64[D]')
+        values = price_matrix.to_numpy(dtype='float64')
+
+        cached = self.load_cache()
+        state = None
+        if cached is not None and version is not None and cached['version'] == version:
+            state = cached
+            self.last_update = 'cached'
+        elif cached is not None:
+            state = self.update_state(cached, crops, dates, values)
+            self.last_update = 'incremental'
+        if state is None:
+            shift = column_shift(values)
+            state = {'crops': crops, 'dates': dates, 'values': values, 'shift': shift,
+                     'updates': 0, **pairwise_sums(values, shift)}
+            self.last_update = 'full'
+
+        if self.last_update != 'cached':
+            state['version'] = version or ''
+            self.save_cache(state)
+
+        self.crops = list(state['crops'])
+        self.positions = {crop: i for i, crop in enumerate(self.crops)}
+        self.correlation = correlation_from_sums(state, self.min_periods)
+        return self
+
+    def update_state(self, cached, crops, dates, values):
+        """以新舊價格矩陣的差異更新累加值，差異太大或無法沿用時回傳 None"""
+        if cached['updates'] >= MAX_INCREMENTAL_UPDATES:
+            return None
+
+        current_positions = {crop: i for i, crop in enumerate(crops)}
+        old_positions = {crop: i for i, crop in enumerate(cached['crops'])}
+        kept = [crop for crop in cached['crops'] if crop in current_positions]
+        added = [crop for crop in crops if crop not in old_positions]
+        if not kept:
+            return None
+
+        kept_old = np.array([old_positions[crop] for crop in kept])
+        kept_new = np.array([current_positions[crop] for crop in kept])
+        shift = cached['shift'][kept_old]
+        old_values = cached['values'][:, kept_old]
+        new_values = values[:, kept_new]
+
+        # 比對新舊交易日：移除的日期扣除、新增的日期加入、內容變動的日期先扣後加
+        common, old_rows, new_rows = np.intersect1d(cached['dates'], dates, return_indices=True)
+        old_common = old_values[old_rows]
+        new_common = new_values[new_rows]
+        same = (old_common == new_common) | (np.isnan(old_common) & np.isnan(new_common))
+        changed = ~same.all(axis=1)
+        removed = np.setdiff1d(np.arange(len(cached['dates'])), old_rows)
+        appended = np.setdiff1d(np.arange(len(dates)), new_rows)
+
+        subtract = np.vstack([old_values[removed], old_common[changed]])
+        add = np.vstack([new_values[appended], new_common[changed]])
+        if len(subtract) + len(add) >= len(dates):
+            return None
+
+        sums = {key: cached[key][np.ix_(kept_old, kept_old)] for key in SUM_KEYS}
+        sums = add_sums(sums, pairwise_sums(subtract, shift), sign=-1)
+        sums = add_sums(sums, pairwise_sums(add, shift))
+        ordered_values = new_values
+
+        if added:
+            # 新出現的作物以完整的價格序列計算與其他作物的累加值
+            added_values = values[:, [current_positions[crop] for crop in added]]
+            added_shift = column_shift(added_values)
+            cross = cross_sums(new_values, shift, added_values, added_shift)
+            own = pairwise_sums(added_values, added_shift)
+            sums = {
+                'n': np.block([[sums['n'], cross['n']], [cross['n'].T, own['n']]]),
+                'sum_x': np.block([[sums['sum_x'], cross['sum_x']], [cross['sum_y'].T, own['sum_x']]]),
+                'sum_xy': np.block([[sums['sum_xy'], cross['sum_xy']], [cross['sum_xy'].T, own['sum_xy']]]),
+                'sum_xx': np.block([[sums['sum_xx'], cross['sum_xx']], [cross['sum_yy'].T, own['sum_xx']]]),
+            }
+            shift = np.concatenate([shift, added_shift])
+            ordered_values = np.hstack([new_values, added_values])
+
+        return {'crops': kept + added, 'dates': dates, 'values': ordered_values,
+                'shift': shift, 'updates': cached['updates'] + 1, **sums}
+
+    def load_cache(self):
+        """讀取磁碟快取，不存在或格式不符時回傳 None"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as archive:
+                state = {key: archive[key] for key in archive.files}
+            state['crops'] = state['crops'].tolist()
+            state['version'] = str(state['version'])
+            state['updates'] = int(state['updates'])
+            return state
+        except Exception as e:
+            print(f"讀取相關係數快取時發生錯誤：{str(e)}")
+            return None
+
+    def save_cache(self, state):
+        """儲存累加值與價格矩陣（先寫暫存檔再取代）"""
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, crops=np.array(state['crops'], dtype=str), dates=state['dates'],
+                         values=state['values'], shift=state['shift'],
+                         updates=np.array(state['updates']), version=np.array(state['version']),
+                         **{key: state[key] for key in SUM_KEYS})
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            print(f"儲存相關係數快取時發生錯誤：{str(e)}")
+
+    def get_correlation(self, crop_a, crop_b):
+        """取得兩種作物的相關係數，無法計算時回傳 NaN"""
+        if crop_a not in self.positions or crop_b not in self.positions:
+            return np.nan
+        return float(self.correlation[self.positions[crop_a], self.positions[crop_b]])
+
+    def to_frame(self):
+        """以 DataFrame 形式回傳相關係數矩陣"""
+        return pd.DataFrame(self.correlation, index=self.crops, columns=self.crops)
+
+    def top_k(self, crop_name, k=5):
+        """找出與指定作物價格相關性（絕對值）最高的 k 種作物"""
+        position = self.positions.get(crop_name)
+        if position is None:
+            return []
+        row = self.correlation[position].copy()
+        row[position] = np.nan
+        candidates = np.flatnonzero(~np.isnan(row))
+        if len(candidates) == 0:
+            return []
+        order = candidates[np.argsort(-np.abs(row[candidates]), kind='stable')][:k]
+        return [(self.crops[i], float(row[i])) for i in order]
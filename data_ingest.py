@@ -0,0 +1,215 @@
+import codecs
+import json
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit
+import numpy as np
+import pandas as pd
+
+# 農產品交易行情資料來源
+FARM_TRANS_URL = "https://data.moa.gov.tw/Service/OpenData/FromM/FarmTransData.aspx"
+FARM_TRANS_HOST = urlsplit(FARM_TRANS_URL).netloc
+
+# 數值欄位直接寫入 float64 緩衝區，其餘欄位保留為字串
+NUMERIC_COLUMNS = ('上價', '中價', '下價', '平均價', '交易量')
+
+# 每次從連線讀取的位元組數
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class FarmDataStreamParser:
+    """以串流方式解析 FarmTransData 的 JSON 陣列，逐筆寫入欄位緩衝區"""
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.buffer = ''
+        self.columns = {}
+        self.interned = {}
+        self.row_count = 0
+        self.started = False
+        self.finished = False
+        self.expect_value = True
+
+    def feed(self, chunk):
+        """餵入一段原始位元組並解析其中已完整的資料列"""
+        if not chunk:
+            return
+        self.buffer += self.text_decoder.decode(chunk)
+        self._drain()
+
+    def close(self):
+        """結束解析並回傳以欄位緩衝區建立的 DataFrame"""
+        self.buffer += self.text_decoder.decode(b'', final=True)
+        self._drain()
+        if not self.finished or self.buffer.strip():
+            raise ValueError("回傳的資料格式不正確")
+        return self.to_frame()
+
+    def to_frame(self):
+        """將欄位緩衝區轉換為 DataFrame"""
+        frame_data = {}
+        for name, buffer in self.columns.items():
+            if isinstance(buffer, array):
+                frame_data[name] = np.frombuffer(buffer, dtype=np.float64)
+            else:
+                frame_data[name] = buffer
+        return pd.DataFrame(frame_data)
+
+    def _drain(self):
+        """解析緩衝區中所有完整的 JSON 物件"""
+        buf = self.buffer
+        pos = 0
+        size = len(buf)
+        while not self.finished:
+            while pos < size and buf[pos] in ' \t\r\n':
+                pos += 1
+            if pos >= size:
+                break
+
+            char = buf[pos]
+            if not self.started:
+                if char != '[':
+                    raise ValueError("回傳的資料格式不正確")
+                self.started = True
+                pos += 1
+            elif char == ']':
+                self.finished = True
+                pos += 1
+            elif not self.expect_value:
+                if char != ',':
+                    raise ValueError("回傳的資料格式不正確")
+                self.expect_value = True
+                pos += 1
+            else:
+                try:
+                    row, end = self.decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    # 物件尚未完整，等待下一段資料
+                    break
+                self._append_row(row)
+                self.expect_value = False
+                pos = end
+        self.buffer = buf[pos:]
+
+    def _new_column(self, name):
+        """建立新欄位緩衝區，並為先前的資料列補上空值"""
+        if name in NUMERIC_COLUMNS:
+            buffer = array('d', [np.nan]) * self.row_count
+        else:
+            buffer = [None] * self.row_count
+            self.interned[name] = {}
+        self.columns[name] = buffer
+        return buffer
+
+    def _append_row(self, row):
+        """將單筆資料寫入各欄位緩衝區"""
+        if not isinstance(row, dict):
+            raise ValueError("回傳的資料格式不正確")
+
+        for name in row:
+            if name not in self.columns:
+                self._new_column(name)
+
+        for name, buffer in self.columns.items():
+            value = row.get(name)
+            if isinstance(buffer, array):
+                try:
+                    buffer.append(float(value))
+                except (TypeError, ValueError):
+                    buffer.append(np.nan)
+            else:
+                # 重複出現的字串（作物、市場名稱）共用同一個物件
+                if isinstance(value, str):
+                    value = self.interned[name].setdefault(value, value)
+                buffer.append(value)
+        self.row_count += 1
+
+
+def parse_farm_data_stream(chunks):
+    """解析位元組片段序列，回傳 DataFrame"""
+    parser = FarmDataStreamParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def fetch_farm_data(session, params=None, url=FARM_TRANS_URL, timeout=None,
+                    cache=None, skip_unchanged=False):
+    """以串流方式下載並解析農產品交易資料
+
+    提供 cache 時經由磁碟快取取得內容；若 skip_unchanged 為真且內容未變更則回傳 None。
+    """
+    if cache is not None:
+        cached = cache.fetch(session, url, params=params, timeout=timeout)
+        if skip_unchanged and not cached.changed:
+            return None
+        return parse_farm_data_stream(cached.iter_content(STREAM_CHUNK_SIZE))
+
+    with session.get(url, params=params, timeout=timeout, stream=True) as response:
+        response.raise_for_status()
+        return parse_farm_data_stream(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+
+
+def load_cached_farm_data(cache, params=None, url=FARM_TRANS_URL):
+    """解析最後一次成功下載的內容，沒有快取時回傳 None"""
+    cached = cache.get_stale(url, params)
+    if cached is None:
+        return None
+    return parse_farm_data_stream(cached.iter_content(STREAM_CHUNK_SIZE))
+
+
+def prefetch_crops(session, crop_names, cache=None, max_workers=8, progress_callback=None,
+                   retry_policy=None, cancel_check=None):
+    """以有限的執行緒並行下載多個作物的資料
+
+    回傳 (合併後的 DataFrame, {作物名稱: 錯誤訊息})。progress_callback 會在每個作物完成時
+    以 (已完成數, 總數, 作物名稱, 錯誤訊息或 None) 呼叫。提供 retry_policy 時依策略重試。
+    cancel_check 會在每個作物開始下載前呼叫，取消時應拋出例外；
+    progress_callback 或 cancel_check 拋出例外時，尚未開始的下載會一併取消。
+    """
+    def fetch_one(name):
+        if cancel_check:
+            cancel_check()
+        if retry_policy is None:
+            return fetch_farm_data(session, params={'crop': name}, cache=cache)
+        return retry_policy.call(fetch_farm_data, session, params={'crop': name},
+                                 cache=cache, host=FARM_TRANS_HOST)
+
+    crop_names = list(dict.fromkeys(crop_names))
+    frames = []
+    failures = {}
+    if not crop_names:
+        return pd.DataFrame(), failures
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(crop_names))) as executor:
+        futures = {executor.submit(fetch_one, name): name for name in crop_names}
+        try:
+            # 依完成順序處理，不必等待最慢的請求
+            for done, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                error = None
+                try:
+                    frame = future.result()
+                    if len(frame) > 0:
+                        frames.append(frame)
+                    else:
+                        error = "沒有可用的資料"
+                except Exception as e:
+                    error = str(e)
+                if error:
+                    failures[name] = error
+                if progress_callback:
+                    progress_callback(done, len(crop_names), name, error)
+                if cancel_check:
+                    cancel_check()
+        except BaseException:
+            # 取消時不再執行佇列中的下載，只等待已在進行中的請求結束
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    if not frames:
+        return pd.DataFrame(), failures
+    # 不同作物的查詢結果可能重疊，合併後去除重複資料列
+    merged = pd.concat(frames, ignore_index=True).drop_duplicates(ignore_index=True)
+    return merged, failures
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+# 民國紀年與西元紀年的差距
+ROC_YEAR_OFFSET = 1911
+
+
+def parse_roc_dates(values):
+    """將民國年日期字串（113.05.01）向量化轉換為日期，無效值為 NaT
+
+    交易資料中日期重複度很高，因此只解析不重複的字串，再依索引對應回每一列。
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    codes, uniques = pd.factorize(series)
+    result = np.full(len(series), np.datetime64('NaT'), dtype='datetime64[ns]')
+    if len(uniques) == 0:
+        return pd.Series(result, index=series.index)
+
+    unique_values = pd.Series(np.asarray(uniques, dtype=object))
+    is_text = unique_values.map(lambda value: isinstance(value, str)).to_numpy(dtype=bool)
+    parts = unique_values.where(is_text, '').astype(str).str.extract(r'^\s*(\d+)\.(\d+)\.(\d+)\s*$')
+
+    year = pd.to_numeric(parts[0], errors='coerce') + ROC_YEAR_OFFSET
+    month = pd.to_numeric(parts[1], errors='coerce')
+    day = pd.to_numeric(parts[2], errors='coerce')
+    converted = pd.to_datetime(pd.DataFrame({'year': year, 'month': month, 'day': day}),
+                               errors='coerce')
+    parsed = converted.to_numpy(dtype='datetime64[ns]')
+
+    valid = codes >= 0
+    result[valid] = parsed[codes[valid]]
+    return pd.Series(result, index=series.index)
+
+
+def parse_roc_date(value):
+    """將單一民國年日期字串轉換為 Timestamp，無效時回傳 NaT"""
+    return parse_roc_dates([value]).iloc[0]
+
+
+def to_roc_date(date):
+    """將西元年日期轉換為民國年字串（113.05.01）"""
+    return f"{date.year - ROC_YEAR_OFFSET}.{date.month:02d}.{date.day:02d}"
+
+
+def to_roc_dates(dates):
+    """將日期欄位向量化轉換為民國年字串，只格式化不重複的日期，無效值為 None"""
+    series = dates if isinstance(dates, pd.Series) else pd.Series(dates)
+    codes, uniques = pd.factorize(series)
+    formatted = np.array([to_roc_date(date) for date in pd.DatetimeIndex(uniques)] + [None], dtype=object)
+    return pd.Series(formatted[codes], index=series.index)
@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+
+
+def fit_trend_month_models(data):
+    """以分組最小平方法一次擬合所有作物的「趨勢 + 月份」線性模型
+
+    每種作物的模型為 平均價 = 截距 + 趨勢係數 × 日期序號 + 月份係數 × 月份。
+    先在各作物內置中，再以分組加總組出 2 × 2 的正規方程，批次以虛反矩陣求解
+    （資料不足時與最小平方法一樣取最小範數解）。
+    """
+    crops = data['作物名稱']
+    start = data.groupby(crops, observed=True)['日期'].transform('min')
+    frame = pd.DataFrame({
+        '作物名稱': crops,
+        '日期序號': (data['日期'] - start).dt.days.astype('float64'),
+        '月份': data['日期'].dt.month.astype('float64'),
+        '平均價': data['平均價'].astype('float64'),
+    })
+    grouped = frame.groupby('作物名稱', observed=True)
+    means = grouped[['日期序號', '月份', '平均價']].mean()
+
+    centered = frame[['日期序號', '月份', '平均價']] - grouped[['日期序號', '月份', '平均價']].transform('mean')
+    t, m, y = (centered[col].to_numpy() for col in ('日期序號', '月份', '平均價'))
+    products = pd.DataFrame({
+        'tt': t * t, 'tm': t * m, 'mm': m * m, 'ty': t * y, 'my': m * y,
+        '作物名稱': frame['作物名稱'],
+    }).groupby('作物名稱', observed=True).sum()
+    products = products.loc[means.index]
+
+    xtx = np.stack([
+        np.stack([products['tt'], products['tm']], axis=-1),
+        np.stack([products['tm'], products['mm']], axis=-1),
+    ], axis=1)
+    xty = np.stack([products['ty'], products['my']], axis=-1)[..., None]
+    coefficients = (np.linalg.pinv(xtx) @ xty)[..., 0]
+
+    intercept = means['平均價'].to_numpy() - (coefficients * means[['日期序號', '月份']].to_numpy()).sum(axis=1)
+    dates = data.groupby(crops, observed=True)['日期'].agg(['min', 'max']).loc[means.index]
+    return pd.DataFrame({
+        '截距': intercept,
+        '趨勢係數': coefficients[:, 0],
+        '月份係數': coefficients[:, 1],
+        '起始日期': dates['min'].to_numpy(),
+        '最後日期': dates['max'].to_numpy(),
+    }, index=pd.Index(means.index.astype(object), name='作物名稱'))
+
+
+def forecast_trend_month(models, days=7):
+    """依擬合好的模型預測每種作物最後交易日之後 days 天的價格，回傳長表格"""
+    steps = np.arange(1, days + 1)
+    last = models['最後日期'].to_numpy(dtype='datetime64[D]')
+    start = models['起始日期'].to_numpy(dtype='datetime64[D]')
+    future = last[:, None] + steps[None, :].astype('timedelta64[D]')
+    day_index = (future - start[:, None]).astype('float64')
+    months = pd.DatetimeIndex(future.ravel()).month.to_numpy().reshape(future.shape)
+
+    predictions = (models['截距'].to_numpy()[:, None]
+                   + models['趨勢係數'].to_numpy()[:, None] * day_index
+                   + models['月份係數'].to_numpy()[:, None] * months)
+    return pd.DataFrame({
+        '作物名稱': np.repeat(models.index.to_numpy(), days),
+        '日期': future.ravel().astype('datetime64[ns]'),
+        '預測價格': predictions.ravel(),
+    })
+
+
+# 可選用的預測模型（代碼: 顯示名稱）
+FORECAST_MODELS = {
+    'linear': '線性趨勢',
+    'ses': '指數平滑',
+    'holt_winters': 'Holt-Winters',
+}
+
+# 季節週期（日曆天）
+WEEKLY_PERIOD = 7
+ANNUAL_PERIOD = 365
+
+# 啟用年季節所需的日曆天數，預測用的資料至少要載入這麼長
+SEASONAL_HISTORY_DAYS = 2 * ANNUAL_PERIOD
+
+
+def build_daily_price_matrix(data):
+    """將交易資料轉為日曆日 × 作物的每日平均價矩陣，休市日為 NaN"""
+    daily = data.groupby(['日期', '作物名稱'], observed=True)['平均價'].mean()
+    matrix = daily.unstack('作物名稱').sort_index().astype('float64')
+    matrix.columns = matrix.columns.astype(object)
+    if len(matrix) == 0:
+        return matrix
+    calendar = pd.date_range(matrix.index.min(), matrix.index.max(), freq='D')
+    return matrix.reindex(calendar)
+
+
+class ExponentialSmoothingForecaster:
+    """以陣列運算同時對所有作物做指數平滑 / Holt-Winters 預測
+
+    採加法誤差修正形式：
+        預測 = 水準 + 趨勢 + 週季節 + 年季節
+        水準 += 趨勢 + α × 誤差，趨勢 += α × β × 誤差，季節 += γ × 誤差
+    每種作物從候選參數中挑選一步預測誤差平方和最小的一組；所有作物與候選參數
+    在同一個迴圈中以陣列一起更新。休市日只推進水準，不更新狀態。
+    年季節需要至少兩年的資料才會啟用。
+    """
+
+    ALPHAS = (0.1, 0.3, 0.6)
+    BETAS = (0.0, 0.05)
+    GAMMAS = (0.05, 0.2)
+
+    def __init__(self, trend=True, seasonal=True):
+        self.trend = trend
+        self.seasonal = seasonal
+        self.crops = []
+        self.periods = []
+        self.first_date = None
+        self.last_date = None
+        self.step = 0
+
+    def parameter_grid(self):
+        """候選參數組合，形狀為 (組合數, 3)：α、β、γ"""
+        betas = self.BETAS if self.trend else (0.0,)
+        gammas = self.GAMMAS if self.seasonal else (0.0,)
+        return np.array([(a, b, g) for a in self.ALPHAS for b in betas for g in gammas])
+
+    def fit(self, data):
+        """由交易資料擬合所有作物的模型"""
+        return self.fit_matrix(build_daily_price_matrix(data))
+
+    def fit_matrix(self, price_matrix):
+        """由日曆日 × 作物的價格矩陣擬合模型"""
+        values = price_matrix.to_numpy(dtype='float64')
+        self.crops = list(price_matrix.columns)
+        self.periods = []
+        if self.seasonal:
+            self.periods.append(WEEKLY_PERIOD)
+            if len(values) >= SEASONAL_HISTORY_DAYS:
+                self.periods.append(ANNUAL_PERIOD)
+
+        grid = self.parameter_grid()
+        self.params = grid[:, :, None] * np.ones((1, 1, len(self.crops)))
+        self.init_state(len(grid))
+        self.sse = np.zeros((len(grid), len(self.crops)))
+        self.step = 0
+        self.run(values, track_error=True)
+
+        # 每種作物保留誤差最小的一組參數與狀態
+        best = self.sse.argmin(axis=0)
+        columns = np.arange(len(self.crops))
+        self.params = self.params[best, :, columns].T[None]
+        self.level = self.level[best, columns][None]
+        self.slope = self.slope[best, columns][None]
+        self.started = self.started[best, columns][None]
+        self.seasonals = [season[:, best, columns][:, None] for season in self.seasonals]
+        self.sse = self.sse[best, columns][None]
+        self.first_date = price_matrix.index[0] if len(price_matrix) else None
+        self.last_date = price_matrix.index[-1] if len(price_matrix) else None
+        return self
+
+    def init_state(self, n_params):
+        """初始化狀態陣列，形狀為 (參數組合數, 作物數)"""
+        shape = (n_params, len(self.crops))
+        self.level = np.zeros(shape)
+        self.slope = np.zeros(shape)
+        self.started = np.zeros(shape, dtype=bool)
+        self.seasonals = [np.zeros((period,) + shape) for period in self.periods]
+
+    def run(self, values, track_error=False):
+        """依序處理每一天的價格（values 形狀為 (天數, 作物數)）"""
+        alpha, beta, gamma = self.params[:, 0], self.params[:, 1], self.params[:, 2]
+        for row in values:
+            seasonal = sum(season[self.step % period]
+                           for season, period in zip(self.seasonals, self.periods))
+            observed = ~np.isnan(row)[None, :] & np.ones_like(self.started)
+            update = observed & self.started
+            error = np.where(update, np.nan_to_num(row) - (self.level + self.slope + seasonal), 0.0)
+            if track_error:
+                self.sse += error * error
+
+            # 第一筆資料作為初始水準
+            first = observed & ~self.started
+            self.level = np.where(first, np.nan_to_num(row), self.level + self.slope + alpha * error)
+            self.slope = self.slope + alpha * beta * error
+            for season, period in zip(self.seasonals, self.periods):
+                season[self.step % period] += gamma * error
+            self.started |= observed
+            self.step += 1
+
+    def update(self, new_rows):
+        """以新交易日的價格線上更新狀態，不需重新擬合
+
+        new_rows 為日期 × 作物的每日平均價（只處理最後預測日期之後的日期），
+        擬合時不存在的作物會被忽略。
+        """
+        if self.last_date is None:
+            return self
+        rows = new_rows[new_rows.index > self.last_date]
+        if len(rows) == 0:
+            return self
+        calendar = pd.date_range(self.last_date + pd.Timedelta(days=1), rows.index.max(), freq='D')
+        rows = rows.reindex(index=calendar, columns=self.crops).astype('float64')
+        self.run(rows.to_numpy())
+        self.last_date = calendar[-1]
+        return self
+
+    def forecast(self, days=7):
+        """預測每種作物最後日期之後 days 天的價格，回傳長表格"""
+        steps = np.arange(1, days + 1)
+        predictions = self.level[0][:, None] + self.slope[0][:, None] * steps[None, :]
+        for season, period in zip(self.seasonals, self.periods):
+            positions = (self.step + steps - 1) % period
+            predictions = predictions + season[positions, 0].T
+        predictions[~self.started[0]] = np.nan
+
+        future = pd.date_range(self.last_date + pd.Timedelta(days=1), periods=days, freq='D')
+        return pd.DataFrame({
+            '作物名稱': np.repeat(np.array(self.crops, dtype=object), days),
+            '日期': np.tile(future.to_numpy(), len(self.crops)),
+            '預測價格': predictions.ravel(),
+        })
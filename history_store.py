@@ -0,0 +1,116 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from date_utils import parse_roc_dates
+
+# 每個交易日一個分區檔案，以欄位為單位儲存
+HISTORY_DIR = os.path.join('data', 'history')
+PARTITION_SUFFIX = '.npz'
+
+
+class HistoryStore:
+    def __init__(self, root_dir=HISTORY_DIR):
+        self.root_dir = root_dir
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    def partition_path(self, trade_date):
+        """取得交易日分區的檔案路徑"""
+        return os.path.join(self.root_dir, f"{trade_date}{PARTITION_SUFFIX}")
+
+    def list_dates(self):
+        """列出已儲存的交易日（西元年，已排序）"""
+        dates = [
+            name[:-len(PARTITION_SUFFIX)]
+            for name in os.listdir(self.root_dir)
+            if name.endswith(PARTITION_SUFFIX)
+        ]
+        return sorted(dates)
+
+    def latest_date(self):
+        """取得最新的交易日"""
+        dates = self.list_dates()
+        return dates[-1] if dates else None
+
+    def append(self, data, overwrite=False):
+        """依交易日寫入新的分區，已存在的交易日預設略過，回傳新寫入的日期"""
+        if data is None or len(data) == 0 or '交易日期' not in data.columns:
+            return []
+
+        trade_dates = parse_roc_dates(data['交易日期'])
+
+        existing = set(self.list_dates())
+        written = []
+        for date, partition in data.groupby(trade_dates, sort=True):
+            trade_date = date.strftime('%Y-%m-%d')
+            if not overwrite and trade_date in existing:
+                continue
+            self._write_partition(trade_date, partition)
+            written.append(trade_date)
+        return written
+
+    def load(self, start_date=None, end_date=None, crops=None):
+        """讀取日期範圍內（含頭尾）的分區，回傳合併後的 DataFrame"""
+        start_date = self._normalize_date(start_date)
+        end_date = self._normalize_date(end_date)
+
+        frames = []
+        for trade_date in self.list_dates():
+            if start_date and trade_date < start_date:
+                continue
+            if end_date and trade_date > end_date:
+                break
+            frame = self._read_partition(trade_date)
+            if crops is not None and '作物名稱' in frame.columns:
+                frame = frame[frame['作物名稱'].isin(crops)]
+            frames.append(frame)
+
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True)
+
+    def load_recent(self, days, crops=None):
+        """讀取最新交易日往前指定天數的資料"""
+        latest = self.latest_date()
+        if latest is None:
+            return pd.DataFrame()
+        start = datetime.strptime(latest, '%Y-%m-%d') - timedelta(days=days - 1)
+        return self.load(start_date=start, end_date=latest, crops=crops)
+
+    def _normalize_date(self, value):
+        """將日期參數統一為 YYYY-MM-DD 字串"""
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return value
+        return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+    def _write_partition(self, trade_date, partition):
+        """以欄位形式寫入單一交易日分區（先寫暫存檔再取代）"""
+        columns = {}
+        for name in partition.columns:
+            series = partition[name]
+            if pd.api.types.is_numeric_dtype(series):
+                columns[name] = series.to_numpy(dtype=np.float64)
+            else:
+                columns[name] = series.fillna('').astype(str).to_numpy(dtype=str)
+
+        path = self.partition_path(trade_date)
+        # 暫存檔名包含執行緒識別，避免同時寫入時互相覆蓋
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **columns)
+        os.replace(tmp_path, path)
+
+    def _read_partition(self, trade_date):
+        """讀取單一交易日分區"""
+        columns = {}
+        with np.load(self.partition_path(trade_date), allow_pickle=False) as archive:
+            for name in archive.files:
+                values = archive[name]
+                if values.dtype.kind == 'U':
+                    # 寫入時以空字串代表空值，讀取時還原
+                    values = pd.Series(values).replace('', None)
+                columns[name] = values
+        return pd.DataFrame(columns)
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# 回應內容快取目錄
+CACHE_DIR = os.path.join('data', 'http_cache')
+
+# 各端點的快取有效時間（秒），以網址前綴比對
+ENDPOINT_TTLS = {
+    "https://data.moa.gov.tw/Service/OpenData/FromM/FarmTransData.aspx": 3600,
+    "https://opendata.cwa.gov.tw/api/v1/rest/datastore/": 1800,
+}
+DEFAULT_TTL = 600
+
+# 寫入快取檔案時每次處理的位元組數
+CACHE_CHUNK_SIZE = 64 * 1024
+
+
+class CachedResponse:
+    """儲存在磁碟上的回應內容"""
+
+    def __init__(self, body_path, meta, changed, from_cache):
+        self.body_path = body_path
+        self.meta = meta
+        # 內容與上次取得的版本不同時為 True
+        self.changed = changed
+        # 沒有重新傳輸內容（快取仍有效或伺服器回應 304）時為 True
+        self.from_cache = from_cache
+
+    @property
+    def version(self):
+        """回應內容的版本識別（內容雜湊值）"""
+        return self.meta.get('sha1')
+
+    def iter_content(self, chunk_size=CACHE_CHUNK_SIZE):
+        """逐段讀取快取內容"""
+        with open(self.body_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+
+    def json(self):
+        """將快取內容解析為 JSON"""
+        with open(self.body_path, 'r', encoding='utf-8-sig') as f:
+            return json.load(f)
+
+
+class ResponseCache:
+    def __init__(self, cache_dir=CACHE_DIR, ttls=None, default_ttl=DEFAULT_TTL):
+        self.cache_dir = cache_dir
+        self.ttls = ENDPOINT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_ttl(self, url):
+        """取得網址對應的快取有效時間"""
+        matches = [prefix for prefix in self.ttls if url.startswith(prefix)]
+        if not matches:
+            return self.default_ttl
+        return self.ttls[max(matches, key=len)]
+
+    def cache_key(self, url, params=None):
+        """以網址與查詢參數產生快取鍵值"""
+        items = sorted((params or {}).items())
+        raw = url + '?' + '&'.join(f"{k}={v}" for k, v in items)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def fetch(self, session, url, params=None, headers=None, timeout=None, ttl=None):
+        """取得回應內容：快取有效時直接使用，否則以 ETag / Last-Modified 重新驗證"""
+        key = self.cache_key(url, params)
+        body_path = os.path.join(self.cache_dir, f"{key}.body")
+        meta = self._load_meta(key)
+        has_body = meta is not None and os.path.exists(body_path)
+        ttl = self.get_ttl(url) if ttl is None else ttl
+
+        if has_body and time.time() - meta.get('fetched_at', 0) < ttl:
+            return CachedResponse(body_path, meta, changed=False, from_cache=True)
+
+        request_headers = dict(headers or {})
+        if has_body:
+            if meta.get('etag'):
+                request_headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                request_headers['If-Modified-Since'] = meta['last_modified']
+
+        with session.get(url, params=params, headers=request_headers,
+                         timeout=timeout, stream=True) as response:
+            if response.status_code == 304 and has_body:
+                meta['fetched_at'] = time.time()
+                self._save_meta(key, meta)
+                return CachedResponse(body_path, meta, changed=False, from_cache=True)
+
+            response.raise_for_status()
+            digest = self._write_body(body_path, response)
+
+            new_meta = {
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'fetched_at': time.time(),
+                'sha1': digest,
+            }
+
+        # 伺服器不支援條件式請求時，以內容雜湊判斷是否變更
+        changed = not has_body or meta.get('sha1') != digest
+        self._save_meta(key, new_meta)
+        return CachedResponse(body_path, new_meta, changed=changed, from_cache=False)
+
+    def get_stale(self, url, params=None):
+        """取得最後一次成功下載的內容（不論是否過期），沒有快取時回傳 None"""
+        key = self.cache_key(url, params)
+        body_path = os.path.join(self.cache_dir, f"{key}.body")
+        meta = self._load_meta(key)
+        if meta is None or not os.path.exists(body_path):
+            return None
+        return CachedResponse(body_path, meta, changed=False, from_cache=True)
+
+    def _write_body(self, body_path, response):
+        """將回應內容串流寫入快取檔案並計算雜湊值"""
+        digest = hashlib.sha1()
+        # 暫存檔名包含執行緒識別，避免同時寫入時互相覆蓋
+        tmp_path = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=CACHE_CHUNK_SIZE):
+                if chunk:
+                    digest.update(chunk)
+                    f.write(chunk)
+        os.replace(tmp_path, body_path)
+        return digest.hexdigest()
+
+    def _load_meta(self, key):
+        """讀取快取的中繼資料"""
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_meta(self, key, meta):
+        """儲存快取的中繼資料"""
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
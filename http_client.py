@@ -0,0 +1,102 @@
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+# 預設逾時（連線秒數, 讀取秒數）
+DEFAULT_TIMEOUT = (5, 30)
+
+# 特定主機的逾時設定，Ollama 產生回應需要較長時間
+HOST_TIMEOUTS = {
+    "26.64.105.58:11434": (5, 120),
+}
+
+# 每個主機同時進行的請求上限
+DEFAULT_HOST_CONCURRENCY = 4
+HOST_CONCURRENCY = {
+    "data.moa.gov.tw": 6,
+    "opendata.cwa.gov.tw": 2,
+    "api.github.com": 2,
+    "26.64.105.58:11434": 1,
+}
+
+
+class HttpClient:
+    """共用的 HTTP 連線池，統一逾時與各主機的並行上限"""
+
+    def __init__(self, pool_connections=10, pool_maxsize=10,
+                 host_timeouts=None, host_concurrency=None):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.host_timeouts = HOST_TIMEOUTS if host_timeouts is None else host_timeouts
+        self.host_concurrency = HOST_CONCURRENCY if host_concurrency is None else host_concurrency
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def get_timeout(self, host):
+        """取得主機對應的逾時設定"""
+        return self.host_timeouts.get(host, DEFAULT_TIMEOUT)
+
+    def get_semaphore(self, host):
+        """取得主機對應的並行限制"""
+        with self.lock:
+            if host not in self.semaphores:
+                limit = self.host_concurrency.get(host, DEFAULT_HOST_CONCURRENCY)
+                self.semaphores[host] = threading.BoundedSemaphore(limit)
+            return self.semaphores[host]
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """發送請求；串流回應在關閉前持續佔用該主機的並行名額"""
+        host = urlsplit(url).netloc
+        if timeout is None:
+            timeout = self.get_timeout(host)
+
+        semaphore = self.get_semaphore(host)
+        semaphore.acquire()
+        try:
+            response = self.session.request(method, url, timeout=timeout, **kwargs)
+        except Exception:
+            semaphore.release()
+            raise
+
+        if not kwargs.get('stream'):
+            semaphore.release()
+            return response
+
+        original_close = response.close
+        released = threading.Event()
+
+        def close():
+            try:
+                original_close()
+            finally:
+                if not released.is_set():
+                    released.set()
+                    semaphore.release()
+
+        response.close = close
+        return response
+
+    def get(self, url, **kwargs):
+        """發送 GET 請求"""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """發送 POST 請求"""
+        return self.request("POST", url, **kwargs)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """取得全域共用的 HttpClient"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+
+# 比對的價格序列長度（日曆天）
+DEFAULT_WINDOW = 120
+
+# 領先/落後最多檢查的天數
+DEFAULT_MAX_LAG = 14
+
+# 計算相關係數所需的最少共同交易日數
+MIN_OVERLAP = 10
+
+
+def build_series_matrix(data, by_market=False):
+    """將交易資料轉為日曆日 × 價格序列的每日平均價矩陣
+
+    by_market=False 時每種作物一條序列；True 時每個（作物, 市場）組合一條序列。
+    沒有交易的日期為 NaN。
+    """
+    keys = ['作物名稱', '市場名稱'] if by_market else ['作物名稱']
+    daily = data.groupby(['日期'] + keys, observed=True)['平均價'].mean()
+    matrix = daily.unstack(keys).sort_index().astype('float64')
+    if len(matrix) == 0:
+        return matrix
+    calendar = pd.date_range(matrix.index.min(), matrix.index.max(), freq='D')
+    return matrix.reindex(calendar)
+
+
+class LaggedSimilarityIndex:
+    """價格序列的領先/落後相似度索引
+
+    每條序列取最近 window 天並標準化（缺值補 0），以 FFT 一次計算與多條序列
+    在各落後天數下的相關係數；大量序列時先以隨機投影（SimHash）分桶找出候選，
+    只對候選序列做精確計算，避免對所有序列兩兩比對。
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, max_lag=DEFAULT_MAX_LAG, n_bits=12,
+                 n_tables=8, min_overlap=MIN_OVERLAP, seed=0):
+        self.window = window
+        self.max_lag = max_lag
+        self.n_bits = n_bits
+        self.n_tables = n_tables
+        self.min_overlap = min_overlap
+        self.seed = seed
+        self.keys = []
+        self.positions = {}
+        self.normalized = np.empty((0, 0))
+        self.mask = np.empty((0, 0))
+        self.length = 0
+        self.projections = np.empty((0, 0, 0))
+        self.tables = []
+
+    def fit(self, data, by_market=False):
+        """由交易資料建立索引"""
+        return self.fit_matrix(build_series_matrix(data, by_market=by_market))
+
+    def fit_matrix(self, series_matrix):
+        """由日期 × 序列的價格矩陣建立索引"""
+        values = series_matrix.to_numpy(dtype='float64')[-self.window:].T
+        mask = ~np.isnan(values)
+        count = mask.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(mask, values, 0.0).sum(axis=1) / count
+            centered = np.where(mask, values - mean[:, None], 0.0)
+            std = np.sqrt((centered * centered).sum(axis=1) / count)
+        # 資料太少或價格沒有變動的序列無法計算相關係數
+        usable = (count >= self.min_overlap) & (std > 0)
+
+        self.keys = [key for key, keep in zip(series_matrix.columns, usable) if keep]
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+        self.normalized = centered[usable] / std[usable, None]
+        self.mask = mask[usable].astype('float64')
+        self.length = values.shape[1]
+        self.fft_size = 1 << int(np.ceil(np.log2(max(2, 2 * self.length))))
+        self.value_spectrum = np.fft.rfft(self.normalized, self.fft_size, axis=1)
+        self.mask_spectrum = np.fft.rfft(self.mask, self.fft_size, axis=1)
+        self.build_tables()
+        return self
+
+    def build_tables(self):
+        """以隨機超平面將標準化序列分桶，每個雜湊表使用不同的投影"""
+        rng = np.random.default_rng(self.seed)
+        self.projections = rng.standard_normal((self.n_tables, self.length, self.n_bits))
+        weights = 1 << np.arange(self.n_bits)
+        self.tables = []
+        for projection in self.projections:
+            codes = ((self.normalized @ projection) > 0) @ weights
+            order = np.argsort(codes, kind='stable')
+            unique_codes, starts = np.unique(codes[order], return_index=True)
+            stops = np.append(starts[1:], len(order))
+            self.tables.append({
+                int(code): order[start:stop]
+                for code, start, stop in zip(unique_codes, starts, stops)
+            })
+
+    def probe_lags(self):
+        """查找候選時平移的落後天數：固定間隔取樣，並一定包含 0 與 ±max_lag"""
+        step = max(1, self.max_lag // 4)
+        lags = set(range(-self.max_lag, self.max_lag + 1, step))
+        lags.update((0, -self.max_lag, self.max_lag))
+        return sorted(lags)
+
+    def shifted_queries(self, position):
+        """產生查詢序列在各落後天數下平移後的版本（含反向），用於查找候選"""
+        query = self.normalized[position]
+        shifted = []
+        for lag in self.probe_lags():
+            vector = np.zeros_like(query)
+            if lag >= 0:
+                vector[lag:] = query[:self.length - lag]
+            else:
+                vector[:lag] = query[-lag:]
+            shifted.extend([vector, -vector])
+        return np.array(shifted)
+
+    def candidates(self, position):
+        """以雜湊表找出可能相似的序列"""
+        weights = 1 << np.arange(self.n_bits)
+        queries = self.shifted_queries(position)
+        found = set()
+        for projection, table in zip(self.projections, self.tables):
+            for code in ((queries @ projection) > 0) @ weights:
+                bucket = table.get(int(code))
+                if bucket is not None:
+                    found.update(bucket.tolist())
+        found.discard(position)
+        return np.array(sorted(found), dtype=int)
+
+    def lagged_correlation(self, position, others):
+        """以 FFT 計算序列與多條序列在 -max_lag ~ max_lag 天的相關係數
+
+        回傳 (落後天數陣列, 相關係數矩陣)；落後天數為正代表查詢序列領先。
+        """
+        lags = np.arange(-self.max_lag, self.max_lag + 1)
+        value_cc = np.fft.irfft(np.conj(self.value_spectrum[position]) * self.value_spectrum[others],
+                                self.fft_size, axis=1)[:, lags]
+        overlap = np.fft.irfft(np.conj(self.mask_spectrum[position]) * self.mask_spectrum[others],
+                               self.fft_size, axis=1)[:, lags]
+        overlap = np.rint(overlap)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation = np.clip(value_cc / overlap, -1.0, 1.0)
+        correlation[overlap < self.min_overlap] = np.nan
+        return lags, correlation
+
+    def query(self, key, k=5, exact=False):
+        """找出與指定序列最相似的 k 條序列
+
+        回傳 [(序列, 落後天數, 相關係數)]，依相關係數絕對值排序；exact=True 時
+        比對所有序列，否則只比對雜湊表找到的候選（候選不足 k 條時改為全部比對）。
+        """
+        position = self.positions.get(key)
+        if position is None:
+            return []
+        others = None if exact else self.candidates(position)
+        if others is None or len(others) < k:
+            others = np.delete(np.arange(len(self.keys)), position)
+        if len(others) == 0:
+            return []
+
+        lags, correlation = self.lagged_correlation(position, others)
+        strength = np.where(np.isnan(correlation), -1.0, np.abs(correlation))
+        best = strength.argmax(axis=1)
+        best_corr = correlation[np.arange(len(others)), best]
+        valid = np.flatnonzero(~np.isnan(best_corr))
+        order = valid[np.argsort(-np.abs(best_corr[valid]), kind='stable')][:k]
+        return [(self.keys[others[i]], int(lags[best[i]]), float(best_corr[i])) for i in order]
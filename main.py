@@ -11,6 +11,17 @@ from tkinter import messagebox
 import time
 import os
 from analysis_utils import DataAnalyzer
+from data_ingest import FARM_TRANS_HOST, fetch_farm_data, load_cached_farm_data, prefetch_crops
+from history_store import HistoryStore
+from date_utils import parse_roc_date, to_roc_date
+from forecasting import FORECAST_MODELS, SEASONAL_HISTORY_DAYS
+from aggregate_cube import rollup
+from market_dimension import MarketDimension
+from result_cache import LRUCache
+from http_cache import ResponseCache
+from http_client import get_http_client
+from retry_policy import RetryPolicy
+from background_tasks import BackgroundTaskRunner
 import webbrowser
 import pyperclip
 import re
@@ -118,21 +129,24 @@ class FarmDataApp:
             # 設定 token 檔案路徑
             self.token_file = os.path.join("Better-vegetable-catcher", "token.txt")
             
-            # 載入資料
+            self.alert_system = PriceAlertSystem()
+            self.visualizer = None  # 將在載入資料時初始化
+            
+            # 初始化資料記錄器
+            self.data_recorder = DataRecorder()
+            
+            # 關閉視窗時先停止背景工作
+            self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+            
+            # 在背景載入資料
             self.load_data()
             
             # 檢查更新
             self.check_for_updates()
             
-            self.alert_system = PriceAlertSystem()
-            self.visualizer = None  # 將在載入資料時初始化
-            
             # 初始化天氣資料
             self.update_weather_display()
             
-            # 初始化資料記錄器
-            self.data_recorder = DataRecorder()
-            
         except Exception as e:
             messagebox.showerror("初始化錯誤", f"程式初始化時發生錯誤：\n{str(e)}")
             raise
@@ -173,15 +187,32 @@ class FarmDataApp:
             self.crop_list = []
             self.filtered_crop_list = []
             self.analyzer = None
-            self.cache = {}
-            self.market_regions = {
-                '北部': ['台北一', '台北二', '三重', '板橋', '桃園', '新竹'],
-                '中部': ['台中', '豐原', '南投', '彰化'],
-                '南部': ['高雄', '鳳山', '屏東', '台南'],
-                '東部': ['宜蘭', '花蓮', '台東']
-            }
+            # 目前的分析器是否由完整行情建立（單一作物或批次載入時為 False）
+            self.full_market_loaded = False
+            # 最近一次載入的完整行情分析器，市場總覽與異常偵測固定使用
+            self.market_analyzer = None
+            # 計算結果快取，鍵值包含資料版本，只在更換資料時清除
+            self.cache = LRUCache()
+            # 本地歷史資料庫，分析時載入最近一段期間
+            self.history_store = HistoryStore()
+            # 預測需要兩年資料才會啟用年季節，因此載入的期間與其一致
+            self.history_days = SEASONAL_HISTORY_DAYS
+            # 磁碟回應快取，以 ETag / Last-Modified 重新驗證
+            self.response_cache = ResponseCache()
+            # 所有對外連線共用同一個連線池
+            self.http = get_http_client()
+            # 指數退避重試，主機異常時由斷路器快速失敗
+            self.retry_policy = RetryPolicy(max_attempts=3, base_delay=1.0, max_delay=8.0)
+            # 市場維度表（區域、縣市），由設定檔載入，新增市場不需修改程式
+            self.market_dimension = MarketDimension.from_config()
             # 初始化日期變數
             self.selected_date = "全部日期"
+            # 批次載入的作物清單
+            self.watchlist = []
+            self.prefetch_workers = 8
+            # 背景載入工作
+            self.task_runner = BackgroundTaskRunner(self.root)
+            self.load_task = None
         except Exception as e:
             messagebox.showerror("資料初始化錯誤", f"初始化資料結構時發生錯誤：\n{str(e)}")
             raise
@@ -359,6 +390,15 @@ class FarmDataApp:
                                                 state="readonly")
             self.calc_method_combo.pack(fill=tk.X, pady=2)
             
+            # 預測模型選擇
+            ttk.Label(analysis_frame, text="📈 預測模型：").pack(anchor=tk.W, pady=2)
+            self.forecast_model_var = tk.StringVar(value=FORECAST_MODELS['holt_winters'])
+            self.forecast_model_combo = ttk.Combobox(analysis_frame, 
+                                                   textvariable=self.forecast_model_var, 
+                                                   values=list(FORECAST_MODELS.values()), 
+                                                   state="readonly")
+            self.forecast_model_combo.pack(fill=tk.X, pady=2)
+            
             # 日期選擇區域
             ttk.Label(analysis_frame, text="📅 日期選擇：").pack(anchor=tk.W, pady=2)
             date_frame = ttk.Frame(analysis_frame)
@@ -379,9 +419,21 @@ class FarmDataApp:
             ttk.Button(button_frame, 
                       text="🔄 重新載入資料", 
                       command=self.reload_data).pack(fill=tk.X, pady=2)
+            ttk.Button(button_frame, 
+                      text="📥 批次載入作物", 
+                      command=self.create_prefetch_window).pack(fill=tk.X, pady=2)
+            ttk.Button(button_frame, 
+                      text="⏹ 取消載入", 
+                      command=self.cancel_loading).pack(fill=tk.X, pady=2)
             ttk.Button(button_frame, 
                       text="📊 查看分析結果", 
                       command=self.update_display).pack(fill=tk.X, pady=2)
+            ttk.Button(button_frame, 
+                      text="📋 市場總覽", 
+                      command=self.show_market_summary).pack(fill=tk.X, pady=2)
+            ttk.Button(button_frame, 
+                      text="🚨 今日異常", 
+                      command=self.show_anomalies).pack(fill=tk.X, pady=2)
             
             # 匯出功能
             ttk.Label(button_frame, text="匯出功能：", style='Subtitle.TLabel').pack(anchor=tk.W, pady=2)
@@ -468,188 +520,256 @@ class FarmDataApp:
         """重新載入資料"""
         try:
             self.status_var.set("正在重新載入資料...")
-            self.root.update()
             self.load_data()
         except Exception as e:
             self.status_var.set(f"重新載入資料時發生錯誤：{str(e)}")
             messagebox.showerror("錯誤", f"重新載入資料時發生錯誤：{str(e)}")
     
+    def start_load_task(self, func, *args, on_success, name):
+        """在背景執行載入工作，新的載入會取消尚未完成的舊工作"""
+        if self.load_task is not None and not self.load_task.done:
+            self.load_task.cancel()
+        
+        def on_error(error):
+            self.status_var.set(f"載入資料時發生錯誤：{str(error)}")
+            messagebox.showerror("錯誤", f"載入資料時發生錯誤：{str(error)}")
+        
+        self.load_task = self.task_runner.submit(
+            func, *args,
+            name=name,
+            on_success=on_success,
+            on_error=on_error,
+            on_progress=self.status_var.set,
+            on_cancel=lambda: self.status_var.set("已取消載入")
+        )
+        return self.load_task
+    
+    def cancel_loading(self):
+        """取消目前的背景載入工作"""
+        if self.load_task is not None and not self.load_task.done:
+            self.load_task.cancel()
+            self.status_var.set("正在取消載入...")
+        else:
+            self.status_var.set("目前沒有載入中的工作")
+    
+    def on_close(self):
+        """關閉視窗：取消背景載入並關閉執行緒池，再結束程式"""
+        try:
+            if self.load_task is not None and not self.load_task.done:
+                self.load_task.cancel()
+            self.task_runner.shutdown()
+        except Exception as e:
+            print(f"停止背景工作時發生錯誤：{str(e)}")
+        finally:
+            self.root.destroy()
+    
     def load_data(self):
-        """載入資料並更新介面"""
+        """在背景載入資料，完成後更新介面"""
         try:
-            self.data = self.fetch_data()
-            if self.data and isinstance(self.data, list) and len(self.data) > 0:
-                # 初始化分析器
-                self.analyzer = DataAnalyzer(self.data)
-                # 初始化視覺化工具
-                self.visualizer = AdvancedVisualizer(self.analyzer.data)
-                
-                # 更新作物列表
-                self.crop_list = sorted(self.analyzer.data['作物名稱'].unique().tolist())
-                if self.crop_list:
-                    self.crop_combo['values'] = self.crop_list
-                    self.crop_combo.set(self.crop_list[0])
-                    self.update_display()
-                    # 檢查價格預警
-                    self.check_price_alerts()
-                    self.status_var.set("資料載入成功")
-                else:
-                    self.status_var.set("沒有有效的作物資料")
-                    messagebox.showwarning("警告", "沒有有效的作物資料")
+            self.status_var.set("正在載入資料...")
+            # 只有目前顯示完整行情時才能在資料未變更時沿用，否則需重新由歷史資料庫建立
+            self.start_load_task(self.load_data_task,
+                                 self.analyzer is not None and self.full_market_loaded,
+                                 on_success=self.apply_loaded_data,
+                                 name="load_data")
+        except Exception as e:
+            self.status_var.set(f"載入資料時發生錯誤：{str(e)}")
+            messagebox.showerror("錯誤", f"載入資料時發生錯誤：{str(e)}")
+    
+    def load_data_task(self, task, skip_unchanged):
+        """背景工作：下載、寫入歷史資料庫並建立分析器（不可操作介面元件）"""
+        task.report_progress("正在下載資料...")
+        fallback_error = None
+        try:
+            fetched = self.fetch_data(skip_unchanged=skip_unchanged)
+        except Exception as e:
+            # 來源無法連線時沿用最後一次成功取得的資料
+            if skip_unchanged:
+                return {'message': f"{str(e)}，沿用現有資料"}
+            if self.history_store.latest_date() is None:
+                raise
+            fetched = pd.DataFrame()
+            fallback_error = str(e)
+        task.check_cancelled()
+        
+        if fetched is None:
+            # 上游資料未變更，沿用現有的分析器
+            return {'message': "資料未變更，沿用現有資料"}
+        
+        # 只將尚未儲存的交易日寫入歷史資料庫
+        task.report_progress("正在寫入歷史資料庫...")
+        self.history_store.append(fetched)
+        task.check_cancelled()
+        
+        task.report_progress("正在讀取歷史資料...")
+        data = self.history_store.load_recent(self.history_days)
+        if len(data) == 0:
+            raise Exception("沒有可用的資料")
+        task.check_cancelled()
+        
+        task.report_progress("正在分析資料...")
+        analyzer = DataAnalyzer(data, compact=True, market_dimension=self.market_dimension)
+        # 沿用已擬合的指數平滑模型與滾動統計，只以新的交易日更新
+        analyzer.inherit_forecasters(self.analyzer)
+        analyzer.inherit_rolling_stats(self.analyzer)
+        task.check_cancelled()
+        
+        # 異常偵測在背景完成，主執行緒檢查預警時直接使用結果
+        task.report_progress("正在偵測異常價格...")
+        analyzer.inherit_anomaly_detector(self.analyzer)
+        analyzer.get_anomaly_detector()
+        task.check_cancelled()
+        
+        if fallback_error:
+            message = f"{fallback_error}，目前顯示本地歷史資料"
+        else:
+            message = f"資料載入成功，{analyzer.format_memory_report()}"
+        return {
+            'data': data,
+            'analyzer': analyzer,
+            'visualizer': AdvancedVisualizer(analyzer),
+            'message': message,
+        }
+    
+    def apply_loaded_data(self, result):
+        """在主執行緒套用背景載入的結果"""
+        try:
+            if 'analyzer' not in result:
+                self.status_var.set(result['message'])
+                return
+            
+            self.data = result['data']
+            self.analyzer = result['analyzer']
+            self.visualizer = result['visualizer']
+            self.full_market_loaded = True
+            self.market_analyzer = result['analyzer']
+            # 資料已更換，舊的計算結果不再需要
+            self.clear_cache()
+            
+            # 更新作物列表
+            self.crop_list = sorted(self.analyzer.get_crop_names())
+            if self.crop_list:
+                self.crop_combo['values'] = self.crop_list
+                self.crop_combo.set(self.crop_list[0])
+                self.update_display()
+                # 檢查價格預警
+                self.check_price_alerts()
+                self.status_var.set(result['message'])
             else:
-                self.status_var.set("沒有可用的資料")
-                messagebox.showerror("錯誤", "沒有可用的資料")
+                self.status_var.set("沒有有效的作物資料")
+                messagebox.showwarning("警告", "沒有有效的作物資料")
         except Exception as e:
             self.status_var.set(f"載入資料時發生錯誤：{str(e)}")
             messagebox.showerror("錯誤", f"載入資料時發生錯誤：{str(e)}")
     
-    def fetch_data(self, max_retries=3):
-        """從農產品交易資料平台下載資料，加入重試機制"""
-        url = "https://data.moa.gov.tw/Service/OpenData/FromM/FarmTransData.aspx"
-        last_error = None
+    def fetch_data(self, skip_unchanged=False):
+        """從農產品交易資料平台下載資料，暫時性錯誤依重試策略處理
         
-        for attempt in range(max_retries):
-            try:
-                response = requests.get(url, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                
-                if isinstance(data, list) and len(data) > 0:
-                    return data
-                else:
-                    last_error = ValueError("回傳的資料格式不正確")
-                    
-            except requests.exceptions.RequestException as e:
-                last_error = e
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                    continue
-                    
-            except ValueError as e:
-                last_error = e
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                    continue
-                    
-            except Exception as e:
-                last_error = e
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                    continue
+        skip_unchanged 為真且資料未變更時回傳 None。
+        """
+        try:
+            # 串流解析回應內容，直接寫入欄位緩衝區
+            data = self.retry_policy.call(fetch_farm_data, self.http,
+                                          cache=self.response_cache,
+                                          skip_unchanged=skip_unchanged,
+                                          host=FARM_TRANS_HOST)
+        except Exception as e:
+            raise Exception(f"下載資料失敗: {str(e)}")
         
-        raise Exception(f"下載資料失敗: {str(last_error)}")
+        if data is not None and len(data) == 0:
+            raise Exception("下載資料失敗: 回傳的資料格式不正確")
+        return data
     
     def get_market_region(self, market_name):
         """根據市場名稱判斷所屬區域"""
-        if not isinstance(market_name, str):
-            return "其他"
-            
-        for region, markets in self.market_regions.items():
-            if any(market in market_name for market in markets):
-                return region
-        return "其他"
+        return self.market_dimension.get_region(market_name)
+    
+    def parse_date_filter(self, text):
+        """解析日期篩選文字（單日「113.05.01」或範圍「113.05.01 ~ 113.05.07」），回傳 (起, 迄)"""
+        if not text or text == "全部日期":
+            return None, None
+        parts = [part.strip() for part in text.split("~")]
+        start_date = parse_roc_date(parts[0])
+        end_date = parse_roc_date(parts[-1])
+        if pd.isna(start_date) or pd.isna(end_date):
+            raise ValueError(f"無法解析日期：{text}")
+        if start_date > end_date:
+            start_date, end_date = end_date, start_date
+        return start_date, end_date
     
     def process_data(self, crop_name, calc_method):
         """處理資料並計算統計值，加入快取機制"""
         try:
-            # 檢查快取
-            cache_key = f"{crop_name}_{calc_method}_{self.date_var.get()}"
-            if cache_key in self.cache:
-                return self.cache[cache_key]
-            
             if not self.analyzer or not isinstance(self.analyzer.data, pd.DataFrame):
                 return None
             
-            # 使用已經處理過的資料
-            df = self.analyzer.data
-            
-            # 篩選特定作物
-            df = df[df['作物名稱'] == crop_name]
+            # 檢查快取
+            cache_key = (crop_name, calc_method, self.date_var.get(), self.analyzer.dataset_version)
+            result = self.cache.get(cache_key)
+            if result is not None:
+                return result
             
-            # 篩選日期（如果已選擇）
+            # 篩選日期（如果已選擇）；無法解析時不改用全部日期，避免結果標示錯誤的期間
             selected_date = self.date_var.get()
-            if selected_date != "全部日期":
-                try:
-                    # 將民國年轉換為西元年
-                    def convert_tw_date(date_str):
-                        try:
-                            year, month, day = map(int, date_str.split('.'))
-                            # 民國年轉西元年
-                            year += 1911
-                            return f"{year}/{month:02d}/{day:02d}"
-                        except:
-                            return date_str
-                    
-                    # 轉換日期格式
-                    df['交易日期'] = df['交易日期'].apply(convert_tw_date)
-                    
-                    # 篩選選擇的日期
-                    df = df[df['交易日期'] == selected_date]
-                except Exception as e:
-                    self.status_var.set(f"日期篩選時發生錯誤：{str(e)}")
+            try:
+                start_date, end_date = self.parse_date_filter(selected_date)
+            except Exception as e:
+                self.status_var.set(f"日期篩選時發生錯誤：{str(e)}")
+                return None
             
-            if len(df) == 0:
+            # 由彙總表以二分搜尋取得作物在日期範圍內的資料格，不掃描原始交易資料
+            cells = self.analyzer.aggregate_cube.get_cells(crop_name, start_date, end_date)
+            if len(cells) == 0:
                 return None
             
             result = ""
-            if calc_method == "加權平均":
-                # 計算加權平均價格（以交易量為權重）
-                total_volume = df['交易量'].sum()
-                if total_volume > 0:
-                    weighted_avg_price = (df['平均價'] * df['交易量']).sum() / total_volume
-                    result = f"""作物：{crop_name}
-計算方式：加權平均
-日期：{selected_date}
-------------------------
-加權平均價格：{weighted_avg_price:.2f} 元/公斤
-資料筆數：{len(df)}
+            if calc_method in ("加權平均", "簡單平均"):
+                stats = rollup(cells).iloc[0]
+                price_stats = f"""資料筆數：{stats['筆數']}
 
 價格統計：
-  最低價：{df['平均價'].min():.2f} 元/公斤
-  最高價：{df['平均價'].max():.2f} 元/公斤
-  標準差：{df['平均價'].std():.2f} 元/公斤
+  最低價：{stats['最低價']:.2f} 元/公斤
+  最高價：{stats['最高價']:.2f} 元/公斤
+  標準差：{stats['價格標準差']:.2f} 元/公斤
 
 交易量統計：
-  總量：{df['交易量'].sum():.2f} 公斤
-  平均：{df['交易量'].mean():.2f} 公斤
-  最大：{df['交易量'].max():.2f} 公斤"""
-            
-            elif calc_method == "簡單平均":
-                # 計算簡單平均價格
-                avg_price = df['平均價'].mean()
-                result = f"""作物：{crop_name}
+  總量：{stats['交易量']:.2f} 公斤
+  平均：{stats['平均交易量']:.2f} 公斤
+  最大：{stats['最大交易量']:.2f} 公斤"""
+                
+                if calc_method == "加權平均":
+                    # 計算加權平均價格（以交易量為權重）
+                    if stats['交易量'] > 0:
+                        result = f"""作物：{crop_name}
+計算方式：加權平均
+日期：{selected_date}
+------------------------
+加權平均價格：{stats['加權平均價']:.2f} 元/公斤
+{price_stats}"""
+                else:
+                    # 計算簡單平均價格
+                    result = f"""作物：{crop_name}
 計算方式：簡單平均
 日期：{selected_date}
 ------------------------
-簡單平均價格：{avg_price:.2f} 元/公斤
-資料筆數：{len(df)}
-
-價格統計：
-  最低價：{df['平均價'].min():.2f} 元/公斤
-  最高價：{df['平均價'].max():.2f} 元/公斤
-  標準差：{df['平均價'].std():.2f} 元/公斤
-
-交易量統計：
-  總量：{df['交易量'].sum():.2f} 公斤
-  平均：{df['交易量'].mean():.2f} 公斤
-  最大：{df['交易量'].max():.2f} 公斤"""
+簡單平均價格：{stats['平均價']:.2f} 元/公斤
+{price_stats}"""
             
             elif calc_method == "分區統計":
-                # 計算各區域統計
-                df['區域'] = df['市場名稱'].apply(self.get_market_region)
+                # 計算各區域統計（市場以類別代碼對應到區域後一次合併）
+                region_stats = rollup(cells, self.market_dimension.region_labels(cells['市場名稱']))
                 result = f"作物：{crop_name}\n計算方式：分區統計\n日期：{selected_date}\n"
                 
-                for region in sorted(df['區域'].unique()):
-                    region_data = df[df['區域'] == region]
+                for region, region_data in region_stats.sort_index().iterrows():
                     result += f"\n{region}區域統計：\n"
                     result += "-" * 30 + "\n"
-                    result += f"平均價格：{region_data['平均價'].mean():.2f} 元/公斤\n"
-                    result += f"最低價格：{region_data['平均價'].min():.2f} 元/公斤\n"
-                    result += f"最高價格：{region_data['平均價'].max():.2f} 元/公斤\n"
-                    result += f"交易總量：{region_data['交易量'].sum():.2f} 公斤\n"
+                    result += f"平均價格：{region_data['平均價']:.2f} 元/公斤\n"
+                    result += f"最低價格：{region_data['最低價']:.2f} 元/公斤\n"
+                    result += f"最高價格：{region_data['最高價']:.2f} 元/公斤\n"
+                    result += f"交易總量：{region_data['交易量']:.2f} 公斤\n"
             
             # 儲存到快取
-            self.cache[cache_key] = result
+            self.cache.put(cache_key, result)
             return result
             
         except Exception as e:
@@ -670,9 +790,6 @@ class FarmDataApp:
                 self.text_area.config(state=tk.DISABLED)  # 恢復為不可編輯
                 return
             
-            # 清除快取，確保使用最新的日期篩選
-            self.clear_cache()
-            
             result = self.process_data(crop_name, calc_method)
             if result:
                 self.text_area.insert(tk.END, result)
@@ -707,22 +824,43 @@ class FarmDataApp:
 
     def clear_cache(self):
         """清除快取資料"""
-        self.cache = {}
+        self.cache.clear()
 
     def load_data_for_selected_crop(self, event=None):
-        """根據選取的作物載入資料"""
+        """根據選取的作物在背景載入資料"""
+        crop_name = self.crop_var.get()
         try:
-            crop_name = self.crop_var.get()
             if not crop_name:
                 self.status_var.set("請選擇作物")
                 return
 
             self.status_var.set(f"正在載入 {crop_name} 的資料...")
-            self.root.update()
-            self.data = self.fetch_data_for_crop(crop_name)
-            if self.data and isinstance(self.data, list) and len(self.data) > 0:
-                # 初始化分析器
-                self.analyzer = DataAnalyzer(self.data)
+            self.start_load_task(self.load_crop_data_task, crop_name,
+                                 on_success=self.apply_crop_data,
+                                 name=f"load_{crop_name}")
+        except Exception as e:
+            self.status_var.set(f"載入 {crop_name} 資料時發生錯誤：{str(e)}")
+            messagebox.showerror("錯誤", f"載入 {crop_name} 資料時發生錯誤：{str(e)}")
+
+    def load_crop_data_task(self, task, crop_name):
+        """背景工作：下載特定作物的資料並建立分析器"""
+        # 單一作物的資料不完整，不寫入歷史資料庫
+        data = self.fetch_data_for_crop(crop_name, notify=task.report_progress)
+        task.check_cancelled()
+        if len(data) == 0:
+            return {'crop_name': crop_name}
+        task.report_progress(f"正在分析 {crop_name} 的資料...")
+        return {'crop_name': crop_name, 'data': data, 'analyzer': DataAnalyzer(data, compact=True, market_dimension=self.market_dimension)}
+
+    def apply_crop_data(self, result):
+        """在主執行緒套用特定作物的載入結果"""
+        crop_name = result['crop_name']
+        try:
+            if 'analyzer' in result:
+                self.data = result['data']
+                self.analyzer = result['analyzer']
+                self.full_market_loaded = False
+                self.clear_cache()
                 self.update_display()
                 self.status_var.set(f"{crop_name} 的資料載入成功")
             else:
@@ -732,41 +870,155 @@ class FarmDataApp:
             self.status_var.set(f"載入 {crop_name} 資料時發生錯誤：{str(e)}")
             messagebox.showerror("錯誤", f"載入 {crop_name} 資料時發生錯誤：{str(e)}")
 
-    def fetch_data_for_crop(self, crop_name, max_retries=3):
-        """從農產品交易資料平台下載特定作物的資料，加入重試機制"""
-        url = f"https://data.moa.gov.tw/Service/OpenData/FromM/FarmTransData.aspx?crop={crop_name}"
-        last_error = None
+    def create_prefetch_window(self):
+        """建立批次載入作物視窗"""
+        try:
+            if not self.crop_list:
+                messagebox.showerror("錯誤", "沒有可用的作物清單")
+                return
+            
+            prefetch_window = tk.Toplevel(self.root)
+            prefetch_window.title("批次載入作物")
+            prefetch_window.geometry("400x500")
+            prefetch_window.transient(self.root)
+            
+            main_frame = ttk.Frame(prefetch_window, padding="10")
+            main_frame.pack(fill=tk.BOTH, expand=True)
+            
+            ttk.Label(main_frame, text="請選擇要載入的作物（可複選）：").pack(anchor=tk.W, pady=5)
+            
+            # 作物清單
+            list_frame = ttk.Frame(main_frame)
+            list_frame.pack(fill=tk.BOTH, expand=True)
+            crop_listbox = tk.Listbox(list_frame, selectmode=tk.MULTIPLE, font=("微軟正黑體", 10))
+            scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=crop_listbox.yview)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            crop_listbox.configure(yscrollcommand=scrollbar.set)
+            crop_listbox.pack(fill=tk.BOTH, expand=True)
+            
+            for index, crop in enumerate(self.crop_list):
+                crop_listbox.insert(tk.END, crop)
+                if crop in self.watchlist:
+                    crop_listbox.selection_set(index)
+            
+            def start_prefetch():
+                """開始批次載入"""
+                selected = [self.crop_list[i] for i in crop_listbox.curselection()]
+                if not selected:
+                    messagebox.showerror("錯誤", "請選擇作物")
+                    return
+                self.watchlist = selected
+                prefetch_window.destroy()
+                self.prefetch_crops(selected)
+            
+            button_frame = ttk.Frame(main_frame)
+            button_frame.pack(fill=tk.X, pady=10)
+            
+            ttk.Button(button_frame, 
+                      text="開始載入", 
+                      command=start_prefetch).pack(side=tk.LEFT, padx=5)
+            ttk.Button(button_frame,
+                      text="全部清除",
+                      command=lambda: crop_listbox.selection_clear(0, tk.END)).pack(side=tk.LEFT, padx=5)
+            ttk.Button(button_frame,
+                      text="取消",
+                      command=prefetch_window.destroy).pack(side=tk.RIGHT, padx=5)
+            
+        except Exception as e:
+            messagebox.showerror("錯誤", f"建立批次載入視窗時發生錯誤：{str(e)}")
 
-        for attempt in range(max_retries):
-            try:
-                response = requests.get(url, timeout=10)
-                response.raise_for_status()
-                data = response.json()
+    def prefetch_crops(self, crop_names):
+        """在背景並行下載多個作物的資料並合併為同一個分析資料集"""
+        try:
+            self.status_var.set(f"正在載入 {len(crop_names)} 種作物的資料...")
+            self.start_load_task(self.prefetch_crops_task, crop_names,
+                                 on_success=self.apply_prefetched_data,
+                                 name="prefetch_crops")
+        except Exception as e:
+            self.status_var.set(f"批次載入作物時發生錯誤：{str(e)}")
+            messagebox.showerror("錯誤", f"批次載入作物時發生錯誤：{str(e)}")
 
-                if isinstance(data, list) and len(data) > 0:
-                    return data
-                else:
-                    last_error = ValueError("回傳的資料格式不正確")
+    def prefetch_crops_task(self, task, crop_names):
+        """背景工作：並行下載多個作物並建立分析器"""
+        def report_progress(done, total, crop_name, error):
+            if error:
+                task.report_progress(f"已完成 {done}/{total}：{crop_name} 載入失敗")
+            else:
+                task.report_progress(f"已完成 {done}/{total}：{crop_name}")
+            task.check_cancelled()
 
-            except requests.exceptions.RequestException as e:
-                last_error = e
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                    continue
+        data, failures = prefetch_crops(self.http, crop_names,
+                                        cache=self.response_cache,
+                                        max_workers=self.prefetch_workers,
+                                        progress_callback=report_progress,
+                                        retry_policy=self.retry_policy,
+                                        cancel_check=task.check_cancelled)
+        result = {'total': len(crop_names), 'failures': failures}
+        if len(data) == 0:
+            return result
 
-            except ValueError as e:
-                last_error = e
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                    continue
+        task.report_progress("正在分析資料...")
+        analyzer = DataAnalyzer(data, compact=True, market_dimension=self.market_dimension)
+        result.update({
+            'data': data,
+            'analyzer': analyzer,
+            'visualizer': AdvancedVisualizer(analyzer),
+        })
+        return result
 
-            except Exception as e:
-                last_error = e
-                if attempt < max_retries - 1:
-                    time.sleep(2)
-                    continue
+    def apply_prefetched_data(self, result):
+        """在主執行緒套用批次載入的結果"""
+        try:
+            failures = result['failures']
+            if 'analyzer' not in result:
+                self.status_var.set("沒有可用的作物資料")
+                messagebox.showerror("錯誤", "批次載入失敗，沒有可用的作物資料")
+                return
+            
+            self.data = result['data']
+            self.analyzer = result['analyzer']
+            self.visualizer = result['visualizer']
+            self.full_market_loaded = False
+            self.clear_cache()
+            self.update_display()
+            
+            loaded = result['total'] - len(failures)
+            self.status_var.set(f"批次載入完成：成功 {loaded} 種，失敗 {len(failures)} 種")
+            if failures:
+                details = "\n".join(f"{crop}：{error}" for crop, error in failures.items())
+                messagebox.showwarning("部分作物載入失敗", details)
+            
+        except Exception as e:
+            self.status_var.set(f"批次載入作物時發生錯誤：{str(e)}")
+            messagebox.showerror("錯誤", f"批次載入作物時發生錯誤：{str(e)}")
+
+    def fetch_data_for_crop(self, crop_name, notify=None):
+        """從農產品交易資料平台下載特定作物的資料，失敗時改用最後一次成功下載的內容
+        
+        notify 用於回報改用快取的訊息，於背景執行緒呼叫時不可直接操作介面元件。
+        """
+        params = {'crop': crop_name}
+        try:
+            data = self.retry_policy.call(fetch_farm_data, self.http, params=params,
+                                          cache=self.response_cache,
+                                          host=FARM_TRANS_HOST)
+            if len(data) > 0:
+                return data
+            error = "回傳的資料格式不正確"
+        except Exception as e:
+            error = str(e)
+
+        # 服務異常時提供最後一次成功下載的資料
+        try:
+            stale = load_cached_farm_data(self.response_cache, params=params)
+        except ValueError:
+            stale = None
+        if stale is not None and len(stale) > 0:
+            if notify:
+                notify(f"{crop_name} 資料下載失敗，改用快取資料：{error}")
+            return stale
 
-        raise Exception(f"下載 {crop_name} 資料失敗: {str(last_error)}")
+        raise Exception(f"下載 {crop_name} 資料失敗: {error}")
 
     def show_price_trend(self):
         """顯示價格趨勢圖"""
@@ -904,6 +1156,19 @@ class FarmDataApp:
             for crop, correlation in similar_crops:
                 self.text_area.insert(tk.END, f"{crop}: 相關係數 = {correlation:.4f}\n")
             
+            # 領先/落後關係
+            lagged_crops = self.analyzer.get_lagged_similar_crops(crop_name)
+            if lagged_crops:
+                self.text_area.insert(tk.END, "\n考慮領先/落後天數後最相似的作物：\n\n")
+                for crop, lag, correlation in lagged_crops:
+                    if lag > 0:
+                        relation = f"{crop_name} 領先 {lag} 天"
+                    elif lag < 0:
+                        relation = f"{crop} 領先 {-lag} 天"
+                    else:
+                        relation = "同步"
+                    self.text_area.insert(tk.END, f"{crop}: 相關係數 = {correlation:.4f}（{relation}）\n")
+            
             self.text_area.config(state=tk.DISABLED)  # 禁止編輯
             self.status_var.set("已顯示相似作物分析")
             
@@ -924,51 +1189,38 @@ class FarmDataApp:
                 messagebox.showwarning("警告", "請先選擇作物")
                 return
             
-            # 獲取該作物的歷史資料
-            df = self.analyzer.data[self.analyzer.data['作物名稱'] == crop_name].copy()
-            if len(df) == 0:
+            # 獲取該作物每日平均價的滾動統計
+            stats = self.analyzer.get_rolling_stats().get_frame(crop_name)
+            if len(stats) == 0:
                 messagebox.showwarning("警告", "沒有足夠的資料進行預測")
                 return
             
-            # 轉換日期格式並排序
-            # 將民國年轉換為西元年
-            def convert_tw_date(date_str):
-                try:
-                    year, month, day = map(int, date_str.split('.'))
-                    # 民國年轉西元年
-                    year += 1911
-                    return f"{year}/{month:02d}/{day:02d}"
-                except:
-                    return date_str
-
-            # 先轉換民國年為西元年，再轉換為日期格式
-            df['交易日期'] = df['交易日期'].apply(convert_tw_date)
-            df['交易日期'] = pd.to_datetime(df['交易日期'], format='%Y/%m/%d')
-            df = df.sort_values('交易日期')
-            
             # 收集相關數據
-            last_price = df['平均價'].iloc[-1]
-            total_volume = df['交易量'].sum()
-            avg_price = df['平均價'].mean()
-            
-            # 計算7日和30日移動平均
-            df['MA7'] = df['平均價'].rolling(window=7).mean()
-            df['MA30'] = df['平均價'].rolling(window=30).mean()
+            latest = stats.iloc[-1]
+            last_price = latest['平均價']
             
             # 獲取最近的移動平均數據
-            last_ma7 = df['MA7'].iloc[-1]
-            last_ma30 = df['MA30'].iloc[-1]
+            last_ma7 = latest['MA7']
+            last_ma30 = latest['MA30']
             
             # 計算價格趨勢（最近7天）
-            recent_trend = df['平均價'].iloc[-7:].diff().mean()
+            recent_trend = stats['平均價'].iloc[-7:].diff().mean()
             trend_direction = "上升" if recent_trend > 0 else "下降" if recent_trend < 0 else "穩定"
             
+            # 以選擇的模型預測未來七天價格
+            model = self.get_selected_forecast_model()
+            predictions = self.analyzer.predict_price(crop_name, days=7, model=model)
+            forecast_text = "、".join(
+                f"{row.日期:%m/%d} {row.預測價格:.2f}" for row in predictions.itertuples()
+            )
+            
             # 構建提示
             prompt = (
                 f"請用100字以內，簡短預測{crop_name}未來七天的價格趨勢。\n"
                 f"目前價格：{last_price:.2f}元/公斤\n"
                 f"7日均價：{last_ma7:.2f}元/公斤\n"
                 f"趨勢：{trend_direction}\n"
+                f"{FORECAST_MODELS[model]}模型預測：{forecast_text}\n"
                 f"\n請直接給出：\n"
                 f"1. 預測價格\n"
                 f"2. 建議操作\n"
@@ -983,6 +1235,10 @@ class FarmDataApp:
             self.text_area.insert(tk.END, f"作物：{crop_name}\n")
             self.text_area.insert(tk.END, f"預測時間：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             self.text_area.insert(tk.END, "-" * 50 + "\n\n")
+            self.text_area.insert(tk.END, f"{FORECAST_MODELS[model]}模型預測（元/公斤）：\n")
+            for row in predictions.itertuples():
+                self.text_area.insert(tk.END, f"  {row.日期:%Y-%m-%d}：{row.預測價格:.2f}\n")
+            self.text_area.insert(tk.END, "\n")
             self.text_area.insert(tk.END, response)
             self.text_area.config(state=tk.DISABLED)
             
@@ -990,6 +1246,14 @@ class FarmDataApp:
             self.status_var.set(f"預測價格時發生錯誤：{str(e)}")
             messagebox.showerror("錯誤", f"預測價格時發生錯誤：{str(e)}")
     
+    def get_selected_forecast_model(self):
+        """取得目前選擇的預測模型代碼"""
+        selected = self.forecast_model_var.get()
+        for model, label in FORECAST_MODELS.items():
+            if label == selected:
+                return model
+        return 'linear'
+    
     def chat_with_ollama(self, prompt):
         payload = {
             "model": MODEL_NAME,
@@ -997,7 +1261,7 @@ class FarmDataApp:
             "stream": False
         }
         try:
-            response = requests.post(OLLAMA_API_URL, json=payload)
+            response = self.http.post(OLLAMA_API_URL, json=payload)
             response.raise_for_status()
             return response.json().get("response", "⚠️ 沒有回應！")
         except Exception as e:
@@ -1079,6 +1343,195 @@ class FarmDataApp:
         except Exception as e:
             messagebox.showerror("錯誤", f"匯出CSV時發生錯誤：{str(e)}")
 
+    def show_market_summary(self):
+        """顯示所有作物的市場總覽（一次計算，可排序、可匯出）"""
+        try:
+            # 選擇單一作物或批次載入後目前的分析器只含部分作物，總覽固定使用完整行情
+            analyzer = self.market_analyzer
+            if not analyzer:
+                messagebox.showerror("錯誤", "尚未載入完整行情，請先重新載入資料")
+                return
+            
+            summary_window = tk.Toplevel(self.root)
+            summary_window.title("市場總覽")
+            summary_window.geometry("1000x650")
+            
+            main_frame = ttk.Frame(summary_window, padding="10")
+            main_frame.pack(fill=tk.BOTH, expand=True)
+            
+            # 篩選條件：預設為目前的日期篩選，未篩選時為最新交易日
+            option_frame = ttk.LabelFrame(main_frame, text="篩選條件", padding="10")
+            option_frame.pack(fill=tk.X, pady=5)
+            
+            date_text = self.date_var.get()
+            if not date_text or date_text == "全部日期":
+                trade_dates = analyzer.get_trade_dates()
+                date_text = to_roc_date(trade_dates[-1]) if len(trade_dates) else "全部日期"
+            ttk.Label(option_frame, text="日期（單日或「起 ~ 迄」）：").pack(side=tk.LEFT)
+            date_var = tk.StringVar(value=date_text)
+            ttk.Entry(option_frame, textvariable=date_var, width=28).pack(side=tk.LEFT, padx=5)
+            region_var = tk.BooleanVar(value=False)
+            ttk.Checkbutton(option_frame, text="依區域分列", variable=region_var).pack(side=tk.LEFT, padx=5)
+            
+            # 總覽表格
+            list_frame = ttk.Frame(main_frame)
+            list_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+            tree = ttk.Treeview(list_frame, show="headings")
+            scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=tree.yview)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            tree.configure(yscrollcommand=scrollbar.set)
+            tree.pack(fill=tk.BOTH, expand=True)
+            
+            state = {'summary': None, 'sort_column': '總交易量', 'ascending': False}
+            
+            def fill_tree():
+                """依目前的排序欄位填入表格"""
+                summary = state['summary'].sort_values(state['sort_column'], ascending=state['ascending'],
+                                                       kind='mergesort', na_position='last')
+                for item in tree.get_children():
+                    tree.delete(item)
+                for row in summary.itertuples(index=False):
+                    tree.insert("", tk.END, values=[
+                        to_roc_date(value) if isinstance(value, pd.Timestamp)
+                        else "" if pd.isna(value) else value
+                        for value in row
+                    ])
+            
+            def sort_by(column):
+                """點選欄位標題排序，再次點選反向排序"""
+                if state['sort_column'] == column:
+                    state['ascending'] = not state['ascending']
+                else:
+                    state['sort_column'] = column
+                    state['ascending'] = True
+                fill_tree()
+            
+            def refresh_summary():
+                """重新計算市場總覽"""
+                try:
+                    start_date, end_date = self.parse_date_filter(date_var.get().strip())
+                    summary = analyzer.get_market_summary(start_date, end_date, by_region=region_var.get())
+                    state['summary'] = summary
+                    if state['sort_column'] not in summary.columns:
+                        state['sort_column'], state['ascending'] = '總交易量', False
+                    columns = list(summary.columns)
+                    tree.configure(columns=columns)
+                    for col in columns:
+                        tree.heading(col, text=col, command=lambda c=col: sort_by(c))
+                        tree.column(col, width=100, anchor=tk.W if col in ('作物名稱', '區域') else tk.E)
+                    fill_tree()
+                    self.status_var.set(f"市場總覽：{summary['作物名稱'].nunique()} 種作物，共 {len(summary)} 列")
+                except Exception as e:
+                    messagebox.showerror("錯誤", f"計算市場總覽時發生錯誤：{str(e)}")
+            
+            def export_summary():
+                """匯出市場總覽為 CSV 或 Excel"""
+                try:
+                    if state['summary'] is None:
+                        return
+                    filename = filedialog.asksaveasfilename(
+                        defaultextension=".xlsx",
+                        filetypes=[("Excel files", "*.xlsx"), ("CSV files", "*.csv")],
+                        initialdir=self.output_dir,
+                        initialfile=f"市場總覽_{datetime.now().strftime('%Y%m%d')}.xlsx"
+                    )
+                    if filename:
+                        summary = state['summary'].sort_values(state['sort_column'], ascending=state['ascending'],
+                                                               kind='mergesort', na_position='last')
+                        analyzer.export_market_summary(summary, filename)
+                        self.status_var.set(f"市場總覽已匯出至 {filename}")
+                        messagebox.showinfo("成功", "資料匯出完成")
+                except Exception as e:
+                    messagebox.showerror("錯誤", f"匯出市場總覽時發生錯誤：{str(e)}")
+            
+            # 按鈕區域
+            button_frame = ttk.Frame(main_frame)
+            button_frame.pack(fill=tk.X, pady=10)
+            
+            ttk.Button(button_frame, 
+                       text="重新計算", 
+                       command=refresh_summary).pack(side=tk.LEFT, padx=5)
+            ttk.Button(button_frame,
+                       text="匯出",
+                       command=export_summary).pack(side=tk.LEFT, padx=5)
+            ttk.Button(button_frame,
+                       text="關閉",
+                       command=summary_window.destroy).pack(side=tk.RIGHT, padx=5)
+            
+            refresh_summary()
+            
+        except Exception as e:
+            messagebox.showerror("錯誤", f"建立市場總覽視窗時發生錯誤：{str(e)}")
+
+    def show_anomalies(self):
+        """顯示最新交易日的價格與交易量異常，依異常分數排序"""
+        try:
+            # 異常偵測固定使用完整行情，不受目前選擇的作物影響
+            if not self.market_analyzer:
+                messagebox.showerror("錯誤", "尚未載入完整行情，請先重新載入資料")
+                return
+            
+            detector = self.market_analyzer.get_anomaly_detector()
+            anomalies = detector.get_latest_anomalies()
+            
+            anomaly_window = tk.Toplevel(self.root)
+            anomaly_window.title("今日異常")
+            anomaly_window.geometry("1000x600")
+            
+            main_frame = ttk.Frame(anomaly_window, padding="10")
+            main_frame.pack(fill=tk.BOTH, expand=True)
+            
+            date_text = to_roc_date(detector.last_date) if detector.last_date is not None else "無資料"
+            ttk.Label(main_frame,
+                      text=f"交易日期：{date_text}　共 {len(anomalies)} 筆異常（|z| ≥ {detector.threshold}）",
+                      style='Subtitle.TLabel').pack(anchor=tk.W, pady=5)
+            
+            # 異常列表
+            list_frame = ttk.Frame(main_frame)
+            list_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+            columns = ("排名", "作物", "市場", "異常類型", "平均價", "近期中位數", "價格z分數",
+                       "交易量", "交易量倍數", "異常分數")
+            tree = ttk.Treeview(list_frame, columns=columns, show="headings")
+            for col in columns:
+                tree.heading(col, text=col)
+                tree.column(col, width=90, anchor=tk.W if col in ("作物", "市場", "異常類型") else tk.E)
+            scrollbar = ttk.Scrollbar(list_frame, orient="vertical", command=tree.yview)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            tree.configure(yscrollcommand=scrollbar.set)
+            tree.pack(fill=tk.BOTH, expand=True)
+            
+            for rank, row in enumerate(anomalies.itertuples(index=False), 1):
+                tree.insert("", tk.END, values=(
+                    rank,
+                    row.作物名稱,
+                    row.市場名稱,
+                    row.異常類型,
+                    f"{row.平均價:.2f}",
+                    f"{row.價格中位數:.2f}",
+                    f"{row.價格z分數:.2f}",
+                    f"{row.交易量:.0f}",
+                    f"{row.交易量倍數:.1f}",
+                    f"{row.異常分數:.2f}"
+                ))
+            
+            def select_crop(event=None):
+                """雙擊列表項目時切換到該作物"""
+                selection = tree.selection()
+                if selection:
+                    self.crop_var.set(tree.item(selection[0])['values'][1])
+                    self.update_display()
+            
+            tree.bind("<Double-1>", select_crop)
+            
+            button_frame = ttk.Frame(main_frame)
+            button_frame.pack(fill=tk.X, pady=10)
+            ttk.Button(button_frame,
+                       text="關閉",
+                       command=anomaly_window.destroy).pack(side=tk.RIGHT, padx=5)
+            
+        except Exception as e:
+            messagebox.showerror("錯誤", f"建立今日異常視窗時發生錯誤：{str(e)}")
+
     def check_for_updates(self):
         """檢查是否有新版本可用"""
         try:
@@ -1087,7 +1540,7 @@ class FarmDataApp:
             
             # 取得最新版本資訊
             headers = {'Accept': 'application/vnd.github.v3+json'}
-            response = requests.get(GITHUB_API_URL, headers=headers, timeout=5)
+            response = self.http.get(GITHUB_API_URL, headers=headers)
             response.raise_for_status()
             latest_release = response.json()
             
@@ -1099,7 +1552,7 @@ class FarmDataApp:
             latest_version_tag = latest_release['tag_name'].replace('v', '')
             if '.web' in latest_version_tag:
                 # 如果是網頁版本，嘗試獲取下一個非網頁版本
-                response = requests.get(f"https://api.github.com/repos/{GITHUB_REPO}/releases", headers=headers, timeout=5)
+                response = self.http.get(f"https://api.github.com/repos/{GITHUB_REPO}/releases", headers=headers)
                 response.raise_for_status()
                 releases = response.json()
                 for release in releases:
@@ -1151,8 +1604,8 @@ class FarmDataApp:
             
             # 取得所有發布版本
             headers = {'Accept': 'application/vnd.github.v3+json'}
-            response = requests.get(f"https://api.github.com/repos/{GITHUB_REPO}/releases", 
-                                 headers=headers, timeout=5)
+            response = self.http.get(f"https://api.github.com/repos/{GITHUB_REPO}/releases", 
+                                     headers=headers)
             response.raise_for_status()
             releases = response.json()
             
@@ -1377,21 +1830,14 @@ class FarmDataApp:
     def check_price_alerts(self):
         """檢查價格預警"""
         try:
-            if not self.analyzer or not isinstance(self.analyzer.data, pd.DataFrame):
+            analyzer = self.market_analyzer
+            if not analyzer or not isinstance(analyzer.data, pd.DataFrame):
                 return
             
-            df = self.analyzer.data
-            current_prices = {}
-            
-            # 獲取最新價格
-            for crop_name in df['作物名稱'].unique():
-                crop_data = df[df['作物名稱'] == crop_name]
-                if not crop_data.empty:
-                    current_prices[crop_name] = crop_data['平均價'].iloc[-1]
-            
-            # 檢查每個作物的預警條件
-            for crop_name, price in current_prices.items():
-                self.alert_system.check_price(crop_name, price)
+            # 以完整行情中各作物最新交易日的價格檢查預警條件
+            self.alert_system.check_prices(analyzer.get_latest_prices())
+            # 最新交易日的價格或交易量異常
+            self.alert_system.check_anomalies(analyzer.get_anomaly_detector().get_latest_anomalies())
             
         except Exception as e:
             self.status_var.set(f"檢查價格預警時發生錯誤：{str(e)}")
@@ -1498,7 +1944,7 @@ class FarmDataApp:
             # 建立日曆視窗
             calendar_window = tk.Toplevel(self.root)
             calendar_window.title("選擇日期")
-            calendar_window.geometry("400x450")
+            calendar_window.geometry("420x560")
             calendar_window.transient(self.root)
             calendar_window.grab_set()
             
@@ -1507,23 +1953,54 @@ class FarmDataApp:
             main_frame.pack(fill=tk.BOTH, expand=True)
             
             # 標題
-            ttk.Label(main_frame, text="請選擇日期", style='Subtitle.TLabel').pack(pady=5)
+            ttk.Label(main_frame, text="請選擇日期或日期範圍", style='Subtitle.TLabel').pack(pady=5)
             
             # 建立日曆框架
             calendar_frame = ttk.Frame(main_frame)
             calendar_frame.pack(fill=tk.BOTH, expand=True, pady=5)
             
+            # 有交易的日期（已選擇作物時只列出該作物的交易日）
+            trade_dates = []
+            if self.analyzer:
+                trade_dates = self.analyzer.get_trade_dates(self.crop_var.get() or None)
+            initial_date = trade_dates[-1] if len(trade_dates) else datetime.now()
+            
             # 建立日曆元件
             from tkcalendar import Calendar
             cal = Calendar(calendar_frame, 
                          selectmode='day',
-                         year=datetime.now().year,
-                         month=datetime.now().month,
-                         day=datetime.now().day,
+                         year=initial_date.year,
+                         month=initial_date.month,
+                         day=initial_date.day,
                          locale='zh_TW',
                          date_pattern='y.m.d')
             cal.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
             
+            # 標示有交易資料的日期
+            for trade_date in trade_dates:
+                cal.calevent_create(trade_date.date(), "有交易資料", 'trade')
+            cal.tag_config('trade', background='#c8e6c9', foreground='black')
+            
+            # 日期範圍
+            current_start, current_end = None, None
+            try:
+                current_start, current_end = self.parse_date_filter(self.date_var.get())
+            except Exception:
+                pass
+            range_frame = ttk.Frame(main_frame)
+            range_frame.pack(fill=tk.X, pady=5)
+            start_var = tk.StringVar(value=to_roc_date(current_start) if current_start is not None else "")
+            end_var = tk.StringVar(value=to_roc_date(current_end) if current_end is not None else "")
+            
+            ttk.Label(range_frame, text="起始日：").grid(row=0, column=0, sticky=tk.W)
+            ttk.Label(range_frame, textvariable=start_var, width=12).grid(row=0, column=1, sticky=tk.W)
+            ttk.Button(range_frame, text="設為起始日",
+                      command=lambda: start_var.set(to_roc_date(cal.selection_get()))).grid(row=0, column=2, padx=5)
+            ttk.Label(range_frame, text="結束日：").grid(row=1, column=0, sticky=tk.W)
+            ttk.Label(range_frame, textvariable=end_var, width=12).grid(row=1, column=1, sticky=tk.W)
+            ttk.Button(range_frame, text="設為結束日",
+                      command=lambda: end_var.set(to_roc_date(cal.selection_get()))).grid(row=1, column=2, padx=5)
+            
             # 按鈕區域
             button_frame = ttk.Frame(main_frame)
             button_frame.pack(fill=tk.X, pady=10)
@@ -1532,10 +2009,7 @@ class FarmDataApp:
                 """套用選擇的日期"""
                 try:
                     # 取得選擇的日期並轉換為民國年格式
-                    selected_date = cal.get_date()
-                    year, month, day = map(int, selected_date.split('.'))
-                    roc_year = year - 1911
-                    date_str = f"{roc_year}.{month:02d}.{day:02d}"
+                    date_str = to_roc_date(cal.selection_get())
                     
                     self.date_var.set(date_str)
                     self.update_display()
@@ -1543,6 +2017,19 @@ class FarmDataApp:
                 except Exception as e:
                     messagebox.showerror("錯誤", f"日期格式轉換錯誤：{str(e)}")
             
+            def apply_range():
+                """套用選擇的日期範圍"""
+                try:
+                    if not start_var.get() or not end_var.get():
+                        messagebox.showwarning("警告", "請先設定起始日與結束日")
+                        return
+                    start_date, end_date = self.parse_date_filter(f"{start_var.get()} ~ {end_var.get()}")
+                    self.date_var.set(f"{to_roc_date(start_date)} ~ {to_roc_date(end_date)}")
+                    self.update_display()
+                    calendar_window.destroy()
+                except Exception as e:
+                    messagebox.showerror("錯誤", f"日期格式轉換錯誤：{str(e)}")
+            
             def clear_date():
                 """清除日期選擇"""
                 self.date_var.set("全部日期")
@@ -1550,8 +2037,11 @@ class FarmDataApp:
                 calendar_window.destroy()
             
             ttk.Button(button_frame, 
-                      text="套用", 
+                      text="套用單日", 
                       command=apply_date).pack(side=tk.LEFT, padx=5)
+            ttk.Button(button_frame, 
+                      text="套用範圍", 
+                      command=apply_range).pack(side=tk.LEFT, padx=5)
             ttk.Button(button_frame,
                       text="清除",
                       command=clear_date).pack(side=tk.LEFT, padx=5)
@@ -1692,16 +2182,15 @@ class FarmDataApp:
         """從中央氣象局API獲取天氣資料"""
         try:
             current_time = time.time()
-            if current_time - self.last_weather_update < self.weather_update_interval:
-                return self.weather_data
 
             url = "https://opendata.cwa.gov.tw/api/v1/rest/datastore/O-A0001-001"
             params = {
                 "Authorization": "CWA-D06A74FF-C0D5-4FAB-9BA6-E3179F69AF55"
             }
             
-            response = requests.get(url, params=params)
-            response.raise_for_status()
+            # 全國測站資料存於磁碟快取，更換地點時不必重新下載
+            response = self.response_cache.fetch(self.http, url, params=params,
+                                                 ttl=self.weather_update_interval)
             data = response.json()
             
             if data.get("success") == "true" and "records" in data:
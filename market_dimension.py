@@ -0,0 +1,104 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+
+# 市場維度設定檔：區域關鍵字、縣市關鍵字與個別市場的設定
+MARKET_CONFIG_FILE = os.path.join('data', 'market_regions.json')
+
+# 設定檔不存在時使用的區域關鍵字
+DEFAULT_REGION_RULES = {
+    '北部': ['台北一', '台北二', '三重', '板橋', '桃園', '新竹'],
+    '中部': ['台中', '豐原', '南投', '彰化'],
+    '南部': ['高雄', '鳳山', '屏東', '台南'],
+    '東部': ['宜蘭', '花蓮', '台東'],
+}
+DEFAULT_REGION = '其他'
+
+# 維度表欄位
+DIMENSION_COLUMNS = ['區域', '縣市', '緯度', '經度']
+
+
+def match_keywords(rules, market_name):
+    """依序比對關鍵字，回傳第一個符合的分類（沒有符合時為 None）"""
+    for label, keywords in rules.items():
+        if any(keyword in market_name for keyword in keywords):
+            return label
+    return None
+
+
+class MarketDimension:
+    """市場維度表：每個市場名稱對應的區域、縣市與座標
+
+    個別市場設定優先，其次依關鍵字比對；每個市場名稱只判斷一次，
+    交易資料再以類別代碼對應，不需逐筆比對字串。
+    """
+
+    def __init__(self, region_rules=None, county_rules=None, markets=None, default_region=DEFAULT_REGION):
+        self.region_rules = region_rules if region_rules is not None else DEFAULT_REGION_RULES
+        self.county_rules = county_rules or {}
+        self.markets = markets or {}
+        self.default_region = default_region
+        self.entries = {}
+
+    @classmethod
+    def from_config(cls, file_path=MARKET_CONFIG_FILE):
+        """由設定檔載入，檔案不存在或格式錯誤時使用預設區域"""
+        if not os.path.exists(file_path):
+            return cls()
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            return cls(region_rules=config.get('regions'),
+                       county_rules=config.get('counties'),
+                       markets=config.get('markets'),
+                       default_region=config.get('default_region', DEFAULT_REGION))
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"載入市場設定失敗，使用預設區域：{str(e)}")
+            return cls()
+
+    def lookup(self, market_name):
+        """取得單一市場的維度資料（區域、縣市、緯度、經度）"""
+        if not isinstance(market_name, str):
+            return {'區域': self.default_region, '縣市': None, '緯度': np.nan, '經度': np.nan}
+        if market_name not in self.entries:
+            setting = self.markets.get(market_name, {})
+            latitude, longitude = setting.get('latitude'), setting.get('longitude')
+            self.entries[market_name] = {
+                '區域': setting.get('region') or match_keywords(self.region_rules, market_name) or self.default_region,
+                '縣市': setting.get('county') or match_keywords(self.county_rules, market_name),
+                '緯度': float(latitude) if latitude is not None else np.nan,
+                '經度': float(longitude) if longitude is not None else np.nan,
+            }
+        return self.entries[market_name]
+
+    def get_region(self, market_name):
+        """市場所屬區域"""
+        return self.lookup(market_name)['區域']
+
+    def build_table(self, market_names):
+        """建立市場維度表，以市場名稱為索引"""
+        names = pd.Index(pd.unique(np.asarray(market_names, dtype=object)), name='市場名稱')
+        rows = [self.lookup(name) for name in names]
+        return pd.DataFrame(rows, index=names, columns=DIMENSION_COLUMNS)
+
+    def labels(self, market_names, column='區域'):
+        """將市場名稱欄位對應到維度欄位，回傳與輸入等長的陣列
+
+        類別欄位直接使用類別代碼對應，其他欄位先 factorize 成代碼，
+        每個不重複的市場名稱只查詢一次。
+        """
+        if isinstance(market_names.dtype, pd.CategoricalDtype):
+            codes = market_names.cat.codes.to_numpy()
+            categories = market_names.cat.categories
+        else:
+            codes, categories = pd.factorize(market_names)
+        values = self.build_table(categories)[column].to_numpy(dtype=object)
+        # 代碼 -1（缺值）對應到最後一格的預設值
+        default = self.lookup(None)[column]
+        values = np.append(values, default)
+        return values[codes]
+
+    def region_labels(self, market_names):
+        """市場名稱欄位對應的區域陣列"""
+        return self.labels(market_names, '區域')
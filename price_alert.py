@@ -1,7 +1,12 @@
 import sqlite3
 import os
+import threading
 from datetime import datetime
-from win10toast import ToastNotifier
+try:
+    from win10toast import ToastNotifier
+except ImportError:
+    # 非 Windows 環境（例如排程主機）改以文字輸出通知
+    ToastNotifier = None
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -9,7 +14,7 @@ from email.mime.multipart import MIMEMultipart
 class PriceAlertSystem:
     def __init__(self):
         self.db_path = os.path.join('data', 'price_alerts.db')
-        self.notifier = ToastNotifier()
+        self.notifier = ToastNotifier() if ToastNotifier else None
         self.setup_database()
         
     def setup_database(self):
@@ -34,6 +39,13 @@ class PriceAlertSystem:
                      notification_type TEXT,
                      created_at TIMESTAMP,
                      is_read INTEGER DEFAULT 0)''')
+        
+        c.execute('''CREATE TABLE IF NOT EXISTS anomaly_notifications
+                    (crop_name TEXT,
+                     market_name TEXT,
+                     trade_date TEXT,
+                     created_at TIMESTAMP,
+                     PRIMARY KEY (crop_name, market_name, trade_date))''')
         conn.commit()
         conn.close()
 
@@ -69,9 +81,22 @@ class PriceAlertSystem:
             for alert in alerts
         ]
 
-    def check_price(self, crop_name, current_price):
-        """檢查特定作物的價格是否觸發預警"""
+    def check_prices(self, current_prices):
+        """一次檢查多個作物的價格（{作物名稱: 價格}），回傳觸發預警的作物"""
         alerts = self.get_all_alerts()
+        triggered = []
+        
+        for crop_name in {alert["crop_name"] for alert in alerts}:
+            if crop_name in current_prices:
+                if self.check_price(crop_name, current_prices[crop_name], alerts):
+                    triggered.append(crop_name)
+        
+        return triggered
+
+    def check_price(self, crop_name, current_price, alerts=None):
+        """檢查特定作物的價格是否觸發預警"""
+        if alerts is None:
+            alerts = self.get_all_alerts()
         triggered = False
         
         for alert in alerts:
@@ -87,8 +112,55 @@ class PriceAlertSystem:
         
         return triggered
 
+    def check_anomalies(self, anomalies, max_notifications=5, background=True):
+        """針對異常偵測標記的觀測值（已依異常分數排序）發送通知，回傳本次通知的作物×市場
+        
+        同一作物、市場、交易日只通知一次；background 為真時在背景執行緒發送通知，
+        避免阻塞介面。
+        """
+        pending = self.filter_new_anomalies(anomalies)
+        messages = [
+            (f"{row.作物名稱}異常預警",
+             f"{row.市場名稱} {row.異常類型}：平均價 {row.平均價:.2f} 元"
+             f"（近期中位數 {row.價格中位數:.2f} 元），交易量為近期中位數的 {row.交易量倍數:.1f} 倍")
+            for row in pending[:max_notifications]
+        ]
+        if len(pending) > max_notifications:
+            messages.append(("異常預警", f"另有 {len(pending) - max_notifications} 筆異常，請查看今日異常列表"))
+        
+        if messages:
+            if background:
+                threading.Thread(target=self.notify_all, args=(messages,), daemon=True).start()
+            else:
+                self.notify_all(messages)
+        return [(row.作物名稱, row.市場名稱) for row in pending[:max_notifications]]
+
+    def filter_new_anomalies(self, anomalies):
+        """記錄異常並回傳尚未通知過的項目（依作物、市場、交易日去除重複）"""
+        conn = sqlite3.connect(self.db_path)
+        c = conn.cursor()
+        pending = []
+        for row in anomalies.itertuples(index=False):
+            c.execute("""INSERT OR IGNORE INTO anomaly_notifications
+                        (crop_name, market_name, trade_date, created_at)
+                        VALUES (?, ?, ?, ?)""",
+                     (row.作物名稱, row.市場名稱, row.日期.strftime('%Y-%m-%d'), datetime.now()))
+            if c.rowcount:
+                pending.append(row)
+        conn.commit()
+        conn.close()
+        return pending
+
+    def notify_all(self, messages):
+        """依序發送多則通知"""
+        for title, message in messages:
+            self.notify(title, message)
+
     def notify(self, title, message):
         """發送通知"""
+        if self.notifier is None:
+            print(f"{title}：{message}")
+            return
         self.notifier.show_toast(title, message, duration=10)
 
     def send_dev_notification(self, title, message, notification_type="system"):
@@ -0,0 +1,46 @@
+import threading
+from collections import OrderedDict
+
+# 預設保留的結果數
+DEFAULT_MAXSIZE = 512
+
+
+class LRUCache:
+    """有容量上限的結果快取，超過上限時移除最久未使用的項目"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """取得快取結果，並標記為最近使用"""
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """儲存結果，必要時移除最久未使用的項目"""
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        """清除所有快取結果"""
+        with self.lock:
+            self.items.clear()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.items
+
+    def __len__(self):
+        return len(self.items)
@@ -0,0 +1,138 @@
+import random
+import threading
+import time
+import requests
+
+# 可重試的 HTTP 狀態碼
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """主機斷路器開啟中，暫停送出請求"""
+
+    def __init__(self, host, retry_after):
+        self.host = host
+        self.retry_after = retry_after
+        super().__init__(f"{host} 暫時無法連線，{retry_after:.0f} 秒後再試")
+
+
+def is_retryable(error):
+    """判斷錯誤是否為暫時性、值得重試的錯誤"""
+    if isinstance(error, (requests.exceptions.ConnectionError,
+                          requests.exceptions.Timeout,
+                          requests.exceptions.ChunkedEncodingError)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        return response is not None and response.status_code in RETRYABLE_STATUS
+    return False
+
+
+class CircuitBreaker:
+    """連續失敗達門檻後開啟斷路器，冷卻期間內直接拒絕請求"""
+
+    def __init__(self, host, failure_threshold=5, reset_timeout=60):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.half_open_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        """目前狀態：closed、open 或 half_open"""
+        with self.lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def before_request(self):
+        """送出請求前檢查，斷路器開啟時拋出 CircuitOpenError"""
+        with self.lock:
+            state = self._state()
+            if state == 'closed':
+                return
+            if state == 'half_open' and not self.half_open_in_flight:
+                # 冷卻結束後只放行一個試探請求
+                self.half_open_in_flight = True
+                return
+            retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(self.host, retry_after)
+
+    def record_success(self):
+        """記錄成功，關閉斷路器"""
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.half_open_in_flight = False
+
+    def record_failure(self):
+        """記錄失敗，達門檻或試探失敗時開啟斷路器"""
+        with self.lock:
+            self.failures += 1
+            if self.half_open_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.half_open_in_flight = False
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(host):
+    """取得主機對應的共用斷路器"""
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker(host)
+        return _breakers[host]
+
+
+class RetryPolicy:
+    """指數退避加隨機抖動的重試策略，並搭配各主機的斷路器"""
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=30.0, sleep=time.sleep):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+
+    def compute_delay(self, attempt, error=None):
+        """計算第 attempt 次失敗後的等待秒數（full jitter），優先採用 Retry-After"""
+        response = getattr(error, 'response', None)
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return min(self.max_delay, float(retry_after))
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, func, *args, host=None, **kwargs):
+        """執行 func，暫時性錯誤依策略重試；其他錯誤立即拋出"""
+        breaker = get_circuit_breaker(host) if host else None
+        for attempt in range(self.max_attempts):
+            if breaker:
+                breaker.before_request()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                retryable = is_retryable(e)
+                if breaker:
+                    if retryable:
+                        breaker.record_failure()
+                    else:
+                        # 非連線問題代表主機仍可回應
+                        breaker.record_success()
+                if not retryable or attempt == self.max_attempts - 1:
+                    raise
+                self.sleep(self.compute_delay(attempt, e))
+                continue
+
+            if breaker:
+                breaker.record_success()
+            return result
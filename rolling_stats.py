@@ -0,0 +1,211 @@
+import bisect
+import copy
+import math
+from collections import deque
+import numpy as np
+import pandas as pd
+
+# 預設的滾動視窗（交易日數）
+DEFAULT_WINDOWS = (7, 30)
+
+
+class RollingWindow:
+    """固定長度視窗的滾動統計，每加入一筆資料以攤銷 O(1) 更新平均、標準差與最小/最大值"""
+
+    def __init__(self, size):
+        self.size = size
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        # 單調佇列：(序號, 值)，最小值佇列遞增、最大值佇列遞減
+        self.min_queue = deque()
+        self.max_queue = deque()
+        self.index = 0
+
+    def push(self, value):
+        """加入一筆資料，超出視窗的舊資料同時移除"""
+        value = float(value)
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+        if len(self.values) > self.size:
+            old = self.values.popleft()
+            self.total -= old
+            self.total_sq -= old * old
+
+        while self.min_queue and self.min_queue[-1][1] >= value:
+            self.min_queue.pop()
+        self.min_queue.append((self.index, value))
+        while self.max_queue and self.max_queue[-1][1] <= value:
+            self.max_queue.pop()
+        self.max_queue.append((self.index, value))
+
+        expired = self.index - self.size
+        if self.min_queue[0][0] <= expired:
+            self.min_queue.popleft()
+        if self.max_queue[0][0] <= expired:
+            self.max_queue.popleft()
+        self.index += 1
+
+    @property
+    def full(self):
+        """視窗是否已滿（未滿時統計值為 NaN，與 pandas rolling 相同）"""
+        return len(self.values) == self.size
+
+    @property
+    def mean(self):
+        return self.total / self.size if self.full else math.nan
+
+    @property
+    def std(self):
+        """樣本標準差（ddof=1）"""
+        if not self.full or self.size < 2:
+            return math.nan
+        variance = (self.total_sq - self.total * self.total / self.size) / (self.size - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    @property
+    def minimum(self):
+        return self.min_queue[0][1] if self.full else math.nan
+
+    @property
+    def maximum(self):
+        return self.max_queue[0][1] if self.full else math.nan
+
+
+class RollingSeries:
+    """單一價格序列（作物或作物×市場的每日平均價）的滾動統計與歷史紀錄"""
+
+    def __init__(self, daily_prices, windows=DEFAULT_WINDOWS):
+        """daily_prices 為以日期為索引、依日期排序的每日平均價"""
+        self.windows = windows
+        prices = daily_prices.astype('float64')
+        # 歷史部分一次以向量化方式計算，之後只做增量更新
+        columns = {'日期': prices.index.to_list(), '平均價': prices.to_list()}
+        for size in windows:
+            rolling = prices.rolling(window=size)
+            columns[f'MA{size}'] = rolling.mean().to_list()
+            columns[f'STD{size}'] = rolling.std().to_list()
+            columns[f'MIN{size}'] = rolling.min().to_list()
+            columns[f'MAX{size}'] = rolling.max().to_list()
+        self.columns = columns
+        self.trackers = {}
+        for size in windows:
+            tracker = RollingWindow(size)
+            for value in prices.iloc[-size:]:
+                tracker.push(value)
+            self.trackers[size] = tracker
+        self.frame = None
+
+    @property
+    def last_date(self):
+        return self.columns['日期'][-1] if self.columns['日期'] else None
+
+    def push(self, date, price):
+        """加入新交易日的價格，各視窗以 O(1) 更新"""
+        self.columns['日期'].append(date)
+        self.columns['平均價'].append(float(price))
+        for size, tracker in self.trackers.items():
+            tracker.push(price)
+            self.columns[f'MA{size}'].append(tracker.mean)
+            self.columns[f'STD{size}'].append(tracker.std)
+            self.columns[f'MIN{size}'].append(tracker.minimum)
+            self.columns[f'MAX{size}'].append(tracker.maximum)
+        self.frame = None
+
+    def trim(self, start_date):
+        """移除 start_date 之前的歷史紀錄（各視窗的追蹤狀態只保留最近資料，不受影響）"""
+        cut = bisect.bisect_left(self.columns['日期'], start_date)
+        if cut:
+            for values in self.columns.values():
+                del values[:cut]
+            self.frame = None
+
+    def latest(self):
+        """最新一個交易日的統計值"""
+        return {name: values[-1] for name, values in self.columns.items()} if self.columns['日期'] else {}
+
+    def to_frame(self):
+        """以 DataFrame 回傳完整歷史（加入新資料前會沿用同一份結果）"""
+        if self.frame is None:
+            self.frame = pd.DataFrame(self.columns)
+        return self.frame
+
+
+class RollingStatsEngine:
+    """依作物（及作物×市場）維護每日平均價的滾動統計
+
+    第一次查詢某條序列時以向量化方式計算歷史，之後新交易日透過 update 逐筆加入。
+    """
+
+    def __init__(self, analyzer, windows=DEFAULT_WINDOWS):
+        self.analyzer = analyzer
+        self.windows = windows
+        self.series = {}
+
+    def get_series(self, crop_name, market_name=None):
+        """取得（必要時建立）序列的滾動統計"""
+        key = (crop_name, market_name)
+        if key not in self.series:
+            crop_data = self.analyzer.get_crop_data(crop_name)
+            if market_name is not None:
+                crop_data = crop_data[crop_data['市場名稱'] == market_name]
+            daily_prices = crop_data.groupby('日期')['平均價'].mean()
+            self.series[key] = RollingSeries(daily_prices, self.windows)
+        return self.series[key]
+
+    def get_frame(self, crop_name, market_name=None):
+        """取得序列的每日平均價與滾動統計表"""
+        return self.get_series(crop_name, market_name).to_frame()
+
+    def get_latest(self, crop_name, market_name=None):
+        """取得序列最新交易日的統計值"""
+        return self.get_series(crop_name, market_name).latest()
+
+    def update(self, data):
+        """以新的交易資料更新已建立的序列，只加入各序列最後日期之後的交易日"""
+        if len(data) == 0 or not self.series:
+            return
+        daily_crop = data.groupby(['作物名稱', '日期'], observed=True)['平均價'].mean()
+        daily_market = data.groupby(['作物名稱', '市場名稱', '日期'], observed=True)['平均價'].mean()
+        for (crop_name, market_name), series in self.series.items():
+            try:
+                if market_name is None:
+                    prices = daily_crop.loc[crop_name]
+                else:
+                    prices = daily_market.loc[(crop_name, market_name)]
+            except KeyError:
+                continue
+            if series.last_date is not None:
+                prices = prices[prices.index > series.last_date]
+            for date, price in prices.sort_index().items():
+                if not np.isnan(price):
+                    series.push(date, price)
+
+    def covers(self, key, series):
+        """序列的歷史是否從新資料中該作物（及市場）的第一個交易日之前開始"""
+        crop_name, market_name = key
+        if crop_name not in self.analyzer.crop_index or series.last_date is None:
+            return False
+        crop_data = self.analyzer.get_crop_data(crop_name)
+        if market_name is not None:
+            crop_data = crop_data[crop_data['市場名稱'] == market_name]
+        if len(crop_data) == 0:
+            return False
+        return series.columns['日期'][0] <= crop_data['日期'].min()
+
+    def adopt(self, previous, data):
+        """沿用前一個引擎已建立的序列，並以新資料增量更新
+
+        歷史紀錄裁切到新資料的起始日期，不在新資料中的作物直接捨棄，
+        避免序列隨每次重新載入無限制成長。序列的起始日期晚於新資料中該作物（及市場）
+        的第一個交易日時（例如前一個分析器只有單一作物的短期資料，或歷史資料已回補），
+        不沿用該序列，之後使用時再重新計算。
+        """
+        self.series = {key: series for key, series in copy.deepcopy(previous.series).items()
+                       if self.covers(key, series)}
+        self.update(data)
+        if len(data) and self.series:
+            start_date = data['日期'].min()
+            for series in self.series.values():
+                series.trim(start_date)